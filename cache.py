@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+网页内容递归阅读器 - 页面缓存 (SQLite)
+
+将已抓取页面的提取结果持久化到本地，中断后重新运行时
+可直接复用，跳过最耗时的页面加载与渲染。
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Optional, Dict, Any
+
+
+# 每写入多少个页面提交一次事务 (提交需要落盘，逐页提交会在事件循环上阻塞所有 worker)
+_COMMIT_EVERY = 20
+
+
+class PageCache:
+    """
+    以去重 Key (主域名+路径) 为主键的页面缓存
+
+    提取结果取决于解析/渲染配置，同一页面在不同配置下分别缓存:
+    实际主键为 "配置指纹:去重 Key"，配置变化后旧条目自然不再命中
+    """
+
+    def __init__(self, path: str, ttl: float = 0, variant: str = ''):
+        """
+        打开 (或创建) 缓存数据库
+
+        Args:
+            path: SQLite 文件路径
+            ttl: 缓存有效期 (秒)，0 表示永不过期
+            variant: 影响提取结果的配置指纹，作为主键前缀
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.ttl = ttl
+        self._pending = 0 # 尚未提交的写入数
+        self._prefix = f"{variant}:" if variant else ''
+        self.conn = sqlite3.connect(path)
+        # WAL + NORMAL: 每页一次写入的开销很低，崩溃时最多丢失最后一个事务
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                fetched_at INTEGER NOT NULL,
+                content TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取未过期的页面提取结果
+
+        Returns:
+            内容字典 (与 _extract_text 返回值相同)，不存在或已过期返回None
+        """
+        row = self.conn.execute(
+            "SELECT fetched_at, content FROM pages WHERE key = ?", (self._prefix + key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        fetched_at, content = row
+        if self.ttl and fetched_at < time.time() - self.ttl:
+            return None
+        return json.loads(content)
+
+    def put(self, key: str, depth: int, content: Dict[str, Any]):
+        """
+        写入 (或覆盖) 页面提取结果
+
+        每 _COMMIT_EVERY 个页面批量提交一次，其余在 close() 时提交；
+        进程异常退出时最多丢失最后一批，重新运行时这些页面会被重新抓取
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (key, url, depth, fetched_at, content) VALUES (?, ?, ?, ?, ?)",
+            (self._prefix + key, content['url'], depth, int(time.time()), json.dumps(content, ensure_ascii=False))
+        )
+        self._pending += 1
+        if self._pending >= _COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        """
+        提交未提交的写入并关闭数据库连接
+        """
+        self.conn.commit()
+        self._pending = 0
+        self.conn.close()
@@ -25,6 +25,31 @@ DEFAULT_CONFIG = {
     "concurrency": 2,        # 降低并发，模拟人类行为
     "wait_until": "domcontentloaded", # 改用 domcontentloaded，因为飞书等SPA有持续网络活动
     "js_render_wait": 5.0,   # 增加等待时间，确保飞书完全渲染
+    "scroll_timeout": None,  # 懒加载滚动的总时间上限 (秒)；None 表示不限时，只受 50 轮滚动上限约束 (到底且高度稳定时会提前结束)
+    "scroll_interval": 0.5,  # 每次滚轮后等待懒加载的最长时间 (秒)，新内容插入且 DOM 平静后会提前继续
+    # 需要完整渲染 (预热 + 视口扩张 + 懒加载滚动) 的域名，包含其子域名，例如 ["feishu.cn", "larksuite.com"]；
+    # None 表示所有页面都走完整渲染，其余站点加载后等待 js_render_wait 即直接取 HTML
+    "full_render_domains": None,
+    # 先用普通 HTTP 请求获取页面，只有 SPA 外壳、请求失败或 full_render_domains 中的站点才启动浏览器渲染；
+    # 需配合 full_render_domains 使用 (为 None 时所有页面都需要完整渲染，不会走 HTTP)
+    "http_first": False,
+    "javascript_enabled": True,  # 静态站点可关闭 JS，飞书等 SPA 必须开启
+    "extract_workers": 0, # HTML 解析进程数 (0 = 在主进程的线程池解析；>0 时放到子进程避免阻塞事件循环，None = min(并发数, CPU 核数))
+    # 浏览器 UserAgent (设为 None 则使用 fake-useragent 随机生成，每个实例只取一次)
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    
+    # 网络拦截: 只需要 HTML 文本，图片/媒体/字体直接中断请求，减少下载与渲染开销
+    # (stylesheet 默认保留：飞书的虚拟滚动与布局高度依赖样式)
+    "block_resource_types": ["image", "media", "font"],
+    # 拦截的第三方统计/广告请求 (正则表达式，匹配请求 URL)
+    "block_url_patterns": [
+        r"://[^/]*google-analytics\.com/",
+        r"://[^/]*googletagmanager\.com/",
+        r"://[^/]*doubleclick\.net/",
+        r"://hm\.baidu\.com/",
+        r"://[^/]*cnzz\.com/",
+        r"://[^/]*sentry\.io/",
+    ],
     
     # ISO-8601 要排除的URL模式 (正则表达式)
     "exclude_patterns": [
@@ -38,6 +63,18 @@ DEFAULT_CONFIG = {
         r".*/register.*",
     ],
     
+    # 丢弃标题与正文完全相同的页面 (不同 URL 返回同一内容时只保留先抓到的一份)
+    # 默认关闭: 被丢弃的 URL 不会出现在 index.md 中，指向它的链接也不会替换为本地文件
+    "dedup_content": False,
+    
+    # 页面缓存 (SQLite): 中断后重新运行时跳过已抓取的页面，None 表示不启用
+    # (按 extract_settings 与渲染相关配置分别缓存，改动这些配置后不会读到旧结果；切换输出格式仍可复用)
+    "cache_path": None,      # 例如 "./output/.page_cache.sqlite3"
+    "cache_ttl": 86400,      # 缓存有效期 (秒)，0 表示永不过期
+    
+    # 调试输出: 打印每个页面的 [DEBUG] 过程日志 (并发抓取时会刷屏，默认关闭)
+    "debug": False,
+    
     # 输出配置
     "output_dir": "./output",
     "output_format": "markdown",  # markdown, json, txt
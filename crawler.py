@@ -14,29 +14,310 @@ if sys.stdout and hasattr(sys.stdout, 'buffer'):
         pass  # 如果失败则忽略，不影响主流程
 
 import asyncio
+import aiohttp
+import hashlib
+import json
+import multiprocessing
 import re
 import os
-from bs4 import BeautifulSoup, Comment
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bs4 import BeautifulSoup, Comment, NavigableString, SoupStrainer, Tag
 from typing import Optional, Set, List, Dict, Any
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 from datetime import datetime
-from fake_useragent import UserAgent
-from asyncio import Semaphore
 from playwright.async_api import async_playwright, Page, BrowserContext
-import inspect
 
 from config import DEFAULT_CONFIG
+from cache import PageCache
 from utils import (
     normalize_url, 
     get_domain, 
     is_same_domain, 
+    compile_exclude_patterns,
     should_exclude_url,
     sanitize_filename,
+    create_output_dir,
     save_content,
+    write_text_file,
+    format_markdown,
     print_progress
 )
 
 
+# 正文容器识别规则 (按优先级排列，等价于选择器
+# .doc-content, .article-content, #doc-content, .main-content, main, [role="main"], .render-unit-wrapper, article)
+# 调整策略：优先抓取最外层的内容容器，防止抓取局部
+_MAIN_CONTENT_RULES = (
+    ('class', 'doc-content'),          # 飞书标准内容容器
+    ('class', 'article-content'),      # 通用
+    ('id', 'doc-content'),
+    ('class', 'main-content'),
+    ('name', 'main'),
+    ('role', 'main'),
+    ('class', 'render-unit-wrapper'),  # 降级：如果上面的都没找到，再试这个
+    ('name', 'article'),
+)
+
+
+def _find_main_content(soup):
+    """
+    一次遍历文档树定位正文容器
+    
+    直接比较标签名/属性，不经过 CSS 选择器引擎；结果与按优先级依次 select_one 相同:
+    优先级最高的规则中文档顺序最靠前的元素。命中最高优先级后立即停止遍历。
+    """
+    best, best_rank = None, len(_MAIN_CONTENT_RULES)
+    for tag in soup.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        attrs = tag.attrs
+        classes = attrs.get('class') or ()
+        for rank in range(best_rank):
+            kind, value = _MAIN_CONTENT_RULES[rank]
+            if kind == 'class':
+                hit = value in classes
+            elif kind == 'name':
+                hit = tag.name == value
+            else:
+                hit = attrs.get(kind) == value
+            if hit:
+                best, best_rank = tag, rank
+                break
+        if best_rank == 0:
+            break
+    return best
+
+# 影响提取结果的配置项: 任一变化时页面缓存视为未命中
+_CACHE_VARIANT_KEYS = (
+    'extract_settings', 'javascript_enabled', 'full_render_domains', 'http_first',
+)
+
+# Chromium 启动参数
+_LAUNCH_ARGS = (
+    '--no-sandbox', '--disable-setuid-sandbox', # Linux/Docker 环境常用，Windows这里加上也没事
+    # Docker 默认 /dev/shm 只有 64MB，改用 /tmp 避免大页面渲染时崩溃；无头抓取用不到 GPU
+    '--disable-dev-shm-usage', '--disable-gpu',
+)
+
+# 浏览器基准视口 (每次复用页签前恢复到此尺寸)
+_BASE_VIEWPORT = {'width': 1920, 'height': 1080}
+
+# 页面内查找真正承载正文滚动的元素: 可滚动元素中 scrollHeight 最大的一个 (window 滚动时即 <html>)
+# 飞书等全高布局的 body 高度恒等于视口，只有内部滚动容器的高度才反映已渲染的内容
+# 全文档遍历 + 布局计算在大 DOM 上代价很高: 结果缓存在 window 上 (导航后自动失效)，
+# 只要缓存的元素仍在文档中且可滚动就直接复用；rescan 为真时强制重新查找 (预热阶段 DOM 仍在构建)
+_FIND_SCROLLER_JS = """
+    const findScroller = (rescan = false) => {
+        const cached = window.__webReaderScroller;
+        if (!rescan && cached && cached.isConnected &&
+            cached.scrollHeight > cached.clientHeight && cached.clientHeight > 0) {
+            return cached;
+        }
+        let main = null;
+        for (const el of document.querySelectorAll('*')) {
+            if (el.scrollHeight > el.clientHeight && el.clientHeight > 0 &&
+                (main === null || el.scrollHeight > main.scrollHeight)) {
+                main = el;
+            }
+        }
+        window.__webReaderScroller = main;
+        return main;
+    };
+    const renderedHeight = (rescan = false) => {
+        const scroller = findScroller(rescan);
+        return scroller === null ? document.body.scrollHeight : scroller.scrollHeight;
+    };
+"""
+
+# 等待骨架屏撑开: 至少等待 minWait 毫秒 (全高布局下没有可靠的"已渲染"信号，保留预热下限)，
+# 之后在页面内轮询正文高度，超过阈值或超时后返回当前文档高度 (用于计算扩张后的视口)
+_WAIT_FOR_HEIGHT_JS = """async ({minHeight, minWait, timeout, interval}) => {""" + _FIND_SCROLLER_JS + """
+    const start = Date.now();
+    while (Date.now() - start < timeout &&
+           (Date.now() - start < minWait || renderedHeight(true) <= minHeight)) {
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+    return document.body.scrollHeight;
+}"""
+
+# 在页面内等待正文高度稳定 (至少 minWait 毫秒，且连续 stableFor 毫秒不变) 或超时，返回最终高度
+# 视口扩张后 React 重绘完成即可继续，不必固定等满
+_WAIT_FOR_STABLE_HEIGHT_JS = """async ({stableFor, minWait, timeout, interval}) => {""" + _FIND_SCROLLER_JS + """
+    const start = Date.now();
+    let last = renderedHeight();
+    let stableSince = start;
+    while (Date.now() - start < timeout) {
+        await new Promise(resolve => setTimeout(resolve, interval));
+        const height = renderedHeight();
+        const now = Date.now();
+        if (height !== last) {
+            last = height;
+            stableSince = now;
+        } else if (now - start >= minWait && now - stableSince >= stableFor) {
+            break;
+        }
+    }
+    return last;
+}"""
+
+# 滚动循环每轮: 等待滚轮触发的懒加载，再取回页面度量 [文档高度, 视口高度, 滚动容器是否已到底]
+# 用 MutationObserver 监听 DOM 变化: 有新内容插入且随后平静 quietFor 毫秒即返回，
+# 一直没有变化时等满 timeout (即原先的固定间隔)；提前返回的轮次较短，调用方按墙钟判断高度稳定时长
+_SCROLL_SETTLE_JS = """async ({quietFor, timeout}) => {""" + _FIND_SCROLLER_JS + """
+    await new Promise(resolve => {
+        let done = false;
+        let quietTimer = null;
+        const finish = () => {
+            if (done) return;
+            done = true;
+            observer.disconnect();
+            clearTimeout(quietTimer);
+            clearTimeout(deadline);
+            resolve();
+        };
+        const observer = new MutationObserver(() => {
+            clearTimeout(quietTimer);
+            quietTimer = setTimeout(finish, quietFor);
+        });
+        const deadline = setTimeout(finish, timeout);
+        observer.observe(document.body, {childList: true, subtree: true});
+    });
+    // 是否到底以实际滚动的容器为准: 容器确实滚动过且已到达其底部
+    // (视口扩张后 window 滚不动、飞书等页面由内部 div 滚动，都不能用 window.scrollY 判断)
+    const scroller = findScroller();
+    const atBottom = scroller !== null && scroller.scrollTop > 0 &&
+        scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 4;
+    return [document.body.scrollHeight, window.innerHeight, atBottom];
+}"""
+
+# HTTP 直取的页面若是 SPA 外壳 (空的挂载点或首屏状态脚本)，正文需要 JS 渲染，改用浏览器抓取
+_SPA_SHELL_RE = re.compile(
+    r'__INITIAL_STATE__|<div\s+id=["\']?(?:root|app)["\']?\s*>\s*</div>',
+    re.IGNORECASE
+)
+
+# 滚回顶部: window 与实际滚动的容器 (飞书等应用是 div 滚动，沿用滚动阶段缓存的结果) 都滚到顶，
+# 然后等待虚拟列表重新挂载首屏内容: DOM 平静 quietFor 毫秒即返回，没有变化时等满 timeout
+_SCROLL_TO_TOP_JS = """async ({quietFor, timeout}) => {""" + _FIND_SCROLLER_JS + """
+    let done = false;
+    let quietTimer = null;
+    let resolveWait;
+    const settled = new Promise(resolve => { resolveWait = resolve; });
+    const finish = () => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(deadline);
+        resolveWait();
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(finish, quietFor);
+    });
+    observer.observe(document.body, {childList: true, subtree: true});
+    const deadline = setTimeout(finish, timeout);
+
+    window.scrollTo(0, 0);
+    const main = findScroller();
+    if (main !== null) {
+        main.scrollTo(0, 0);
+    }
+    await settled;
+}"""
+
+# 解析时只保留 <title> 与 <body> 子树，<head> 中大量 meta/link 不再构造成 BS4 节点
+_PARSE_ONLY = SoupStrainer(['title', 'body'])
+
+
+# 连续空白折叠
+_WS_RE = re.compile(r'\s+')
+
+# 噪音文本黑名单 (合并为一个正则，一次扫描完成匹配)
+_NOISE_BLACKLIST = ["附件不支持打印", "文档链接直达", "评论区", "更多分类内容", "前往语雀", "扫码登录", "转到元文档"]
+_NOISE_RE = re.compile('|'.join(map(re.escape, _NOISE_BLACKLIST)))
+
+# 正文块级元素 (只处理最底层的块)
+_BLOCK_TAGS = frozenset({'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'blockquote', 'pre', 'div', 'section'})
+
+# 飞书伪标题识别: class 片段与 data-block-type
+_HEADING_CLASS_RE = re.compile(r'(?:heading-h|ace-line-heading-)([1-6])')
+_HEADING_BLOCK_TYPES = {f'heading{n}': n for n in range(1, 7)}
+# 标准标题标签 -> 级别
+_HEADING_TAGS = {f'h{n}': n for n in range(1, 7)}
+
+# 行内格式标签 -> Markdown 标记
+_INLINE_MARKERS = {'strong': '**', 'b': '**', 'em': '*', 'i': '*', 'code': '`'}
+
+# 正文内需要整体移除的导航/页脚等非正文区域
+_NOISE_TAGS = frozenset(['nav', 'footer', 'header', 'aside', 'iframe', 'noscript'])
+
+# 行内渲染时忽略的隐藏元素
+_HIDDEN_TAGS = frozenset({'style', 'script', 'noscript', 'iframe'})
+
+# 飞书 div 表格中视为单元格的 role (表头行 / 数据行)
+_HEADER_CELL_ROLES = frozenset(['columnheader', 'cell', 'gridcell'])
+_ROW_CELL_ROLES = frozenset(['cell', 'gridcell'])
+
+# Markdown 外链 [text](http...)，用于保存时的本地链接替换
+# 链接文本不跨行: 块文本已折叠空白，限定在单行内可避免大量未闭合 "[" 时的逐字符回扫
+_MD_LINK_RE = re.compile(r'\[([^\]\n]+)\]\((http[^)]+)\)')
+
+# 输出格式 -> 文件扩展名
+_OUTPUT_EXTENSIONS = {'markdown': '.md', 'json': '.json', 'txt': '.txt'}
+
+# 保存结果时并发写文件的线程数
+_SAVE_WORKERS = 8
+
+# 任意 Markdown 链接 [text](href)，用于双重链接防护
+_MD_INLINE_LINK_RE = re.compile(r'\[.+\]\(.+\)')
+
+# 飞书有序列表的显式序号 (如 "1.")
+_ORDER_NUM_RE = re.compile(r'^\d+\.?$')
+
+
+def _class_contains(tag_name: Optional[str], *fragments: str):
+    """
+    构造 find_all 过滤函数，等价于 CSS 选择器 `tag[class*="fragment"], ...`
+    
+    由 BS4 原生遍历直接调用，避免 soupsieve 在每个节点上解释执行选择器。
+    """
+    def match(tag) -> bool:
+        if tag_name and tag.name != tag_name:
+            return False
+        return _class_has(tag, *fragments)
+    return match
+
+
+def _class_has(tag, *fragments: str) -> bool:
+    """
+    标签的任一 class 是否包含任一片段 (子串匹配)
+
+    与 `fragment in str(tag.get('class', []))` 结果相同 (片段中不含引号/逗号/空格)，
+    但直接在 class 列表上判断，不必为每次检查生成列表的 repr 字符串。
+    """
+    classes = tag.get('class')
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        return any(fragment in classes for fragment in fragments)
+    return any(fragment in cls for cls in classes for fragment in fragments)
+
+
+def _is_link_tag(tag) -> bool:
+    """find_all 过滤函数：标准链接 a[href] 或隐式链接 [data-href] / [data-url]"""
+    return (tag.name == 'a' and tag.has_attr('href')) or tag.has_attr('data-href') or tag.has_attr('data-url')
+
+
+def _has_any_attr(*names: str):
+    """构造 find_all 过滤函数，等价于 CSS 选择器 `[name1], [name2], ...`"""
+    def match(tag) -> bool:
+        return any(tag.has_attr(name) for name in names)
+    return match
+
+
 class WebReader:
     """
     网页内容递归阅读器 (Playwright内核)
@@ -54,10 +335,52 @@ class WebReader:
         self.config = {**DEFAULT_CONFIG, **(config or {})}
         self.visited_urls: Set[str] = set()
         self.visited_keys: Set[str] = set() # 用于去重 (主域名+路径)
+        self._scheduled_keys: Set[str] = set() # 已创建抓取任务但尚未访问的Key
+        self._unique_keys: Dict[str, str] = {} # URL -> 去重Key 的缓存 (同一链接会出现在很多页面上)
         self.completed_count: int = 0
         self.results: List[Dict[str, Any]] = []
         self.link_tree: Dict[str, List[str]] = {} # 记录页面链接结构，用于保序
-        self.ua = UserAgent()
+        self._content_digests: Set[bytes] = set() # 已保存页面正文的摘要，用于丢弃内容完全相同的页面
+        self._ua_str: Optional[str] = None # 本实例使用的 UserAgent (首次 crawl 时确定)
+        # 预编译排除规则，避免每个链接都重新编译
+        self._exclude_re = compile_exclude_patterns(self.config['exclude_patterns'])
+        # 浏览器网络拦截规则
+        self._blocked_types = frozenset(self.config.get('block_resource_types') or ())
+        self._blocked_url_re = compile_exclude_patterns(self.config.get('block_url_patterns'))
+        # HTML 解析进程池 (crawl 期间有效)
+        self._extract_pool: Optional[ProcessPoolExecutor] = None
+        # 页面缓存 (crawl 期间有效，用于中断后续跑)
+        self._cache: Optional[PageCache] = None
+        # HTTP 直取会话 (启用 http_first 时 crawl 期间有效)
+        self._http: Optional[aiohttp.ClientSession] = None
+
+    def _get_user_agent(self) -> str:
+        """
+        获取浏览器上下文使用的 UserAgent
+        
+        优先使用配置中的固定 UA；未配置时才延迟加载 fake-useragent 随机选取一个，
+        避免在 __init__ 中同步读取其 UA 数据库。结果在实例上缓存。
+        """
+        if self._ua_str is None:
+            ua = self.config.get('user_agent')
+            if not ua:
+                from fake_useragent import UserAgent
+                ua = UserAgent().random
+            self._ua_str = ua
+        return self._ua_str
+
+    def _needs_full_render(self, url: str) -> bool:
+        """
+        判断页面是否需要走完整渲染流程 (视口扩张 + 懒加载滚动 + 滚回顶部)
+        
+        full_render_domains 为 None 时所有页面都走完整流程；
+        否则只有列出的域名 (含其子域名) 才走，其余页面加载后直接取 HTML。
+        """
+        domains = self.config.get('full_render_domains')
+        if domains is None:
+            return True
+        netloc = get_domain(url)
+        return any(netloc == d or netloc.endswith('.' + d) for d in domains)
 
     def _get_unique_key(self, url: str) -> str:
         """
@@ -66,15 +389,21 @@ class WebReader:
         - 对于 其他网站: 使用完整 URL (包含子域名和查询参数)
         这样既解决了飞书的重复抓取问题，又不会破坏依赖 query 参数的普通网站。
         """
+        key = self._unique_keys.get(url)
+        if key is not None:
+            return key
+        
         root_domain = get_domain(url, extract_root=True)
-        parsed = urlparse(url)
         
         # 针对飞书/Lark 的特定优化
-        if root_domain in ['feishu.cn', 'larksuite.com']:
-            return f"{root_domain}{parsed.path}"
-            
-        # 通用策略：完整 URL (已在 normalize_url 中去除了 hash 和 trailing slash)
-        return url
+        if root_domain in ('feishu.cn', 'larksuite.com'):
+            key = f"{root_domain}{urlsplit(url).path}"
+        else:
+            # 通用策略：完整 URL (已在 normalize_url 中去除了 hash 和 trailing slash)
+            key = url
+        
+        self._unique_keys[url] = key
+        return key
         
     def _extract_text(self, html: str, url: str) -> Dict[str, Any]:
         """
@@ -89,18 +418,29 @@ class WebReader:
         """
         # 注意: 即使使用了 Playwright，我们依然使用 BS4 进行文本清洗，
         # 因为它在处理 HTML 结构和去噪方面非常方便。
-        soup = BeautifulSoup(html, 'lxml')
-
         settings = self.config['extract_settings']
 
+        soup = BeautifulSoup(html, 'lxml', parse_only=_PARSE_ONLY)
+
         # --- 策略：构建全局文本链接映射 (Text -> URL) ---
         # 飞书正文中的列表项往往没有 href，但左侧目录树里有。
         # 我们利用左侧目录树的信息来"补全"正文中的死链接。
         text_to_link_map = {}
         # 为了避免误匹配，我们设定最小文本长度，并忽略太通用的词
-        for a in soup.find_all('a', href=True):
-            text = a.get_text(strip=True)
-            href = a['href']
+        # 整棵树只需按标签名筛 a[href]: 直接遍历 descendants，比 find_all 的通用过滤器开销小得多
+        for a in soup.descendants:
+            if not isinstance(a, Tag) or a.name != 'a':
+                continue
+            href = a.get('href')
+            if href is None:
+                continue
+            # 目录项通常只有一个文本子节点: 直接取 .string，避免 get_text 递归遍历子树
+            # (.string 也可能是注释等特殊字符串，此时仍交给 get_text 处理)
+            text = a.string
+            if type(text) is NavigableString:
+                text = text.strip()
+            else:
+                text = a.get_text(strip=True)
             # 只有当文本长度合适且不是纯数字/符号时才记录
             if len(text) > 1 and not text.isdigit() and href:
                 # 飞书特定优化：侧边栏链接通常包含 token，这是高质量链接
@@ -114,24 +454,8 @@ class WebReader:
         # 优先在去噪之前定位，以免删除了不该删的容器
         main_content = None
         
-        # 飞书等现代文档通常有明确的容器
-        # 调整策略：优先抓取最外层的内容容器，防止抓取局部
-        possible_selectors = [
-            '.doc-content',          # 飞书标准内容容器
-            '.article-content',      # 通用
-            '#doc-content',
-            '.main-content',
-            'main',
-            '[role="main"]',
-            '.render-unit-wrapper',  # 降级：如果上面的都没找到，再试这个
-            'article'
-        ]
-        
-        for selector in possible_selectors:
-            main_content = soup.select_one(selector)
-            if main_content:
-
-                break
+        # 飞书等现代文档通常有明确的容器 (按优先级排列，见 _MAIN_CONTENT_RULES)
+        main_content = _find_main_content(soup)
         
         # 降级策略: 如果找不到特定容器，使用 body，但尝试排除 sidebar
         if not main_content:
@@ -140,51 +464,64 @@ class WebReader:
 
         # --- 2. 从 Main Content 提取链接 ---
         # 仅提取正文内的链接，避免抓取侧边栏/导航栏
-        links = []
         raw_links = []
+        text_link_targets, comments, noise_tags, code_tags = [], [], [], []
+        # 需要移除的 <script>/<style>: 在 DOM 中 decompose，前后的文本节点仍各自独立
+        # (在源码层面剔除会把 "Alpha<script>…</script>Beta" 拼成一个文本节点)
+        code_names = set()
+        if settings['remove_scripts']:
+            code_names.add('script')
+        if settings['remove_styles']:
+            code_names.add('style')
         if main_content:
-            # 标准链接
-            raw_links.extend(main_content.find_all('a', href=True))
-            # 隐式链接 (data-href / data-url) - 飞书等SPA常用
-            raw_links.extend(main_content.select('[data-href], [data-url]'))
-            
-            # --- 关键修复: 将文本映射的链接也加入待抓取队列 ---
-            # 因为我们在生成 Markdown 时会把匹配 map 的纯文本变成链接
-            # 所以这里也必须把它们加入队列，否则只会生成链接却不会去爬
-            for text_node in main_content.find_all(string=True):
-                stripped = text_node.strip()
-                if len(stripped) > 1 and stripped in text_to_link_map:
-                    # 避免重复添加 (虽然 links 后续会去重，但为了效率)
-                    # 注意：raw_links 是 Tag 列表，这里我们直接把 URL 加到 links 里可能更好
-                    # 但为了保持逻辑统一，我们在下面的循环里处理
-                    pass
+            # 对正文子树只遍历一次，同时收集:
+            # 标准链接与隐式链接 (data-href / data-url - 飞书等SPA常用)、
+            # 可由映射表补全链接的文本节点 (映射表已在上面建好，直接查表)、脚本/样式、注释、噪音标签
+            # 结果与分别 find_all 的顺序一致，后续按原先的先后步骤处理
+            link_tags = []
+            for node in main_content.descendants:
+                if isinstance(node, Tag):
+                    if _is_link_tag(node):
+                        link_tags.append(node)
+                    if node.name in _NOISE_TAGS:
+                        noise_tags.append(node)
+                    elif node.name in code_names:
+                        code_tags.append(node)
+                elif isinstance(node, NavigableString):
+                    stripped = node.strip()
+                    if len(stripped) > 1 and stripped in text_to_link_map:
+                        text_link_targets.append(text_to_link_map[stripped])
+                    if isinstance(node, Comment):
+                        comments.append(node)
+            # 按 "标准链接在前，隐式链接在后" 的原顺序排列
+            raw_links.extend(tag for tag in link_tags if tag.name == 'a' and tag.has_attr('href'))
+            raw_links.extend(tag for tag in link_tags if tag.has_attr('data-href') or tag.has_attr('data-url'))
         else:
             raw_links.extend(soup.find_all('a', href=True))
-            raw_links.extend(soup.select('[data-href], [data-url]'))
+            raw_links.extend(soup.find_all(_has_any_attr('data-href', 'data-url')))
             
 
         
-        valid_links_count = 0
-        
         # 1. 处理 Tag 链接
-        for tag in raw_links:
-            url_val = tag.get('href') or tag.get('data-href') or tag.get('data-url')
-            if not url_val: continue
-            
-            href = normalize_url(url_val, url)
-            if href:
-                links.append(href)
-                valid_links_count += 1
+        # 导航/目录中同一 href 常重复出现: 先对原始值保序去重，只标准化一次，
+        # 标准化后的结果再保序去重 (不同写法可能指向同一 URL)
+        raw_hrefs = dict.fromkeys(filter(None, (
+            tag.get('href') or tag.get('data-href') or tag.get('data-url') for tag in raw_links
+        )))
+        links = list(dict.fromkeys(filter(None, (normalize_url(h, url) for h in raw_hrefs))))
+        valid_links_count = len(links)
         
         # 2. 处理文本补全链接 (仅在 main_content 模式下)
+        # --- 关键修复: 将文本映射的链接也加入待抓取队列 ---
+        # 因为我们在生成 Markdown 时会把匹配 map 的纯文本变成链接
+        # 所以这里也必须把它们加入队列，否则只会生成链接却不会去爬
         if main_content:
-            for text_node in main_content.find_all(string=True):
-                stripped = text_node.strip()
-                if len(stripped) > 1 and stripped in text_to_link_map:
-                    target_url = text_to_link_map[stripped]
-                    if target_url not in links: # 简单去重
-                        links.append(target_url)
-                        valid_links_count += 1
+            seen_links = set(links)
+            for target_url in text_link_targets:
+                if target_url not in seen_links: # 简单去重
+                    seen_links.add(target_url)
+                    links.append(target_url)
+                    valid_links_count += 1
                         
 
 
@@ -192,21 +529,16 @@ class WebReader:
         # 注意: 如果 main_content 只是 soup 的一部分引用，decompose 会影响 soup，也会影响 main_content
         
         # 移除不需要的标签
-        if settings['remove_scripts']:
-            for script in main_content.find_all('script'):
-                script.decompose()
-        
-        if settings['remove_styles']:
-            for style in main_content.find_all('style'):
-                style.decompose()
+        for tag in code_tags:
+            tag.decompose()
         
         if settings['remove_comments']:
-            for comment in main_content.find_all(string=lambda text: isinstance(text, Comment)):
+            for comment in comments:
                 comment.extract()
         
         # 移除导航、页脚等非正文区域 (通常正文容器里不应该包含这些，但防万一)
         # 注意：不要删除 div，否则可能把内容删了
-        for tag in main_content.find_all(['nav', 'footer', 'header', 'aside', 'iframe', 'noscript']):
+        for tag in noise_tags:
             # 飞书有时候用 header 做标题容器，所以要小心
             # 如果是 header 且包含 h1/h2，可能有用，保留
             if tag.name == 'header' and tag.find(['h1', 'h2']):
@@ -218,54 +550,55 @@ class WebReader:
         title_tag = soup.find('title')
         if title_tag:
             title = title_tag.get_text(strip=True)
-            
+
         # 2. 辅助函数：处理行内元素，保留格式 (前置定义，供表格使用)
-        def process_node(node):
-            if isinstance(node, str):
-                # 尝试对纯文本进行链接补全
-                stripped = node.strip()
-                
-                # 防止在已经是链接的情况下重复添加 (双重链接问题)
-                # 必须检查所有祖先节点，不仅仅是直接父级 (例如 <a><span>Text</span></a>)
-                # 同时也要检查 data-href/data-url 的容器，因为它们也会被处理成链接
-                is_link_container = lambda tag: tag.name == 'a' or tag.has_attr('data-href') or tag.has_attr('data-url')
-                if node.find_parent(is_link_container):
-                    return node
-                
-                if stripped in text_to_link_map:
-                    return f"[{node}]({text_to_link_map[stripped]})"
+        # 防止在已经是链接的情况下重复添加 (双重链接问题)
+        # 必须检查所有祖先节点，不仅仅是直接父级 (例如 <a><span>Text</span></a>)
+        # 同时也要检查 data-href/data-url 的容器，因为它们也会被处理成链接
+        # 以下辅助函数对每个节点都会调用: 直接读 node.attrs 字典，省去 has_attr/get 的方法调用
+        def is_link_container(tag):
+            attrs = tag.attrs
+            return tag.name == 'a' or 'data-href' in attrs or 'data-url' in attrs
+
+        def render_string(node, in_link):
+            # 尝试对纯文本进行链接补全
+            if in_link:
                 return node
-            
+            stripped = node.strip()
+            if stripped in text_to_link_map:
+                return f"[{node}]({text_to_link_map[stripped]})"
+            return node
+
+        def is_skipped(node):
             # 忽略隐藏元素
-            if node.name in ['style', 'script', 'noscript', 'iframe']:
-                return ''
+            if node.name in _HIDDEN_TAGS:
+                return True
             
             # --- 安全优化: 忽略飞书列表的显式序号 ---
             # 因为我们在 Markdown 列表输出时会自动带上序号
-            if node.name == 'div' and 'order' in node.get('class', []):
+            if node.name == 'div' and 'order' in node.attrs.get('class', ()):
                  # 确保只过滤纯序号 (如 "1.")
                  txt = node.get_text(strip=True)
-                 if re.match(r'^\d+\.?$', txt):
-                     return ''
-            
-            content = ''
-            if hasattr(node, 'children'):
-                for child in node.children:
-                    content += process_node(child)
-                
+                 if _ORDER_NUM_RE.match(txt):
+                     return True
+            return False
+
+        def render_tag(node, content):
             # 处理链接
             href = None
+            attrs = node.attrs
             if node.name == 'a':
-                href = node.get('href')
-            elif node.has_attr('data-href'):
-                href = node.get('data-href')
-            elif node.has_attr('data-url'):
-                href = node.get('data-url')
+                href = attrs.get('href')
+            elif 'data-href' in attrs:
+                href = attrs['data-href']
+            elif 'data-url' in attrs:
+                href = attrs['data-url']
             
             # --- 双重链接防护 (第一道防线) ---
             # 如果子内容已经是链接格式，不要再做任何链接处理
             stripped_content = content.strip()
-            contains_link = bool(re.search(r'\[.+\]\(.+\)', stripped_content))
+            # "](" 是 Markdown 链接的必要标志: 绝大多数片段不含它，先用子串判断跳过正则
+            contains_link = '](' in stripped_content and _MD_INLINE_LINK_RE.search(stripped_content) is not None
             if contains_link:
                 return stripped_content
             
@@ -281,18 +614,44 @@ class WebReader:
                     else:
                         return content
             
-            # 处理加粗、斜体等
-            if node.name in ['strong', 'b']:
-                return f"**{content.strip()}**"
-            if node.name in ['em', 'i']:
-                return f"*{content.strip()}*"
-            if node.name == 'code':
-                return f"`{content.strip()}`"
+            # 处理加粗、斜体等 (按标签名查表)
+            marker = _INLINE_MARKERS.get(node.name)
+            if marker:
+                return f"{marker}{content.strip()}{marker}"
             if node.name == 'br':
                 return "\n"
                 
             return content
 
+        def process_node(root, in_link=None):
+            # 迭代式后序遍历 (显式栈)，避免深层递归的函数调用开销；
+            # 子节点片段先收集到列表，出栈时再一次性 join，避免 += 的平方级拼接。
+            # 是否处于链接容器内随栈帧向下传递，无需对每个文本节点回溯祖先。
+            # in_link: 调用方已知 root 是否有链接容器祖先时直接传入，省去向上查找
+            if in_link is None:
+                in_link = root.find_parent(is_link_container) is not None
+            if isinstance(root, str):
+                return render_string(root, in_link)
+            if is_skipped(root):
+                return ''
+            
+            # 栈帧: (节点, 子节点迭代器, 子节点片段, 是否处于链接容器内)
+            stack = [(root, iter(root.children), [], in_link or is_link_container(root))]
+            while True:
+                node, children, parts, in_link = stack[-1]
+                for child in children:
+                    if isinstance(child, str):
+                        parts.append(render_string(child, in_link))
+                    elif not is_skipped(child):
+                        stack.append((child, iter(child.children), [], in_link or is_link_container(child)))
+                        break
+                else:
+                    stack.pop()
+                    text = render_tag(node, ''.join(parts))
+                    if not stack:
+                        return text
+                    stack[-1][2].append(text)
+
         # 1. 表格处理 (增强版：支持标准 Table 和 ARIA Grid/Table)
         
 
@@ -301,81 +660,34 @@ class WebReader:
         table_markdown_map = {}  # 占位符 ID -> Markdown 表格内容
         table_index = 0
         
-        # 查找所有可能的表格容器
-        # 1. 标准 table 标签
-        # 2. ARIA 表格 (div role="table" / "grid" / "treegrid")
-        potential_tables = []
-        potential_tables.extend(main_content.find_all('table'))
-        potential_tables.extend(main_content.select('[role="table"], [role="grid"], [role="treegrid"]'))
-        
-        # 去重 (防止 table 标签同时有 role 属性被添加两次)
-        unique_tables = []
-        seen_tables = set()
-        for t in potential_tables:
-            if t in seen_tables: continue
-            seen_tables.add(t)
-            unique_tables.append(t)
-
-        for table in unique_tables:
-            rows_data = []
-            
-            # --- 策略 A: 标准 HTML 表格 ---
-            if table.name == 'table':
-                for tr in table.find_all('tr'):
-                    cells = []
-                    for td in tr.find_all(['td', 'th']):
-                        cell_content = process_node(td).strip()
-                        cell_content = re.sub(r'\s+', ' ', cell_content).replace('\n', ' ').replace('|', '\\|')
-                        cells.append(cell_content)
-                    if cells:
-                        rows_data.append(cells)
-            
-            # --- 策略 B: ARIA 伪表格 (div 结构) ---
-            else:
-                # 查找行 (role="row")
-                raw_rows = table.select('[role="row"]')
-                
-                # 飞书/通用 Grid 适配：如果找不到 role="row"，尝试 class 匹配
-                if not raw_rows:
-                    # 尝试查找包含 row 关键字的 div
-                    # 针对飞书: table-view-header-row, table-view-row
-                    raw_rows = table.select('div[class*="table-view-header-row"], div[class*="table-view-row"]')
-                
-                for row in raw_rows:
-                    cells = []
-                    # 查找单元格
-                    # 1. 标准 ARIA role
-                    raw_cells = row.select('[role="cell"], [role="gridcell"], [role="columnheader"], [role="rowheader"]')
-                    
-                    # 2. 飞书适配: table-view-cell, table-view-header-cell
-                    if not raw_cells:
-                        raw_cells = row.select('div[class*="table-view-cell"], div[class*="table-view-header-cell"]')
-                        
-                    for cell in raw_cells:
-                        cell_content = process_node(cell).strip()
-                        cell_content = re.sub(r'\s+', ' ', cell_content).replace('\n', ' ').replace('|', '\\|')
-                        cells.append(cell_content)
-                    
-                    if cells:
-                        rows_data.append(cells)
+        # 标准 <table> 与 ARIA 表格 (role="table"/"grid") 不转换为 Markdown 表格，
+        # 其文字由后面的块级遍历输出
+        
         # --- 补充策略：精确匹配飞书/Notion等基于div的表格 ---
         # 逻辑：找到 Header -> 查找紧邻的 Body/Rows -> 独立处理每个表格
         
         # 查找所有表头容器
         # 针对飞书: class="table-view-header" (容器) 或 class="table-view-header-row" (行)
-        headers = list(main_content.select('div[class*="table-view-header-row"]'))
+        # 标准 table 与 ARIA 表格已不单独遍历，这里是唯一的表格扫描；
+        # 源码中根本没有该 class 时 (非飞书页面) 直接跳过整棵子树的遍历
+        if 'table-view-header-row' in html:
+            headers = main_content.find_all(_class_contains('div', 'table-view-header-row'))
+        else:
+            headers = []
         
         # 为了防止父子包含关系（如果 table-view-header 包含 row），我们先去重
         # 但飞书通常是平级的。
         
-        for header_row in headers:
+        container_rows = {} # id(rows_container) -> (rows_container, 顶层 row 列表)
+        
+        for current_header_idx, header_row in enumerate(headers):
             # 检查这个 header 是否已经被处理过 (作为某个 table 的一部分被替换了)
             if header_row.parent and header_row.parent.get('data-table-processed'):
                 continue
                 
             # 找到包含这个 header row 的最小容器（通常是 table-view-header）
             header_container = header_row.parent
-            while header_container and 'table-view-header' not in str(header_container.get('class', [])):
+            while header_container and not _class_has(header_container, 'table-view-header'):
                 if header_container.name == 'body': break
                 header_container = header_container.parent
             
@@ -384,22 +696,23 @@ class WebReader:
             
             # 1. 提取表头数据
             header_cells = []
+            # 同一行的单元格共享祖先链: 是否处于链接容器内只对行判断一次，
+            # 不必让 process_node 为每个单元格向上查找
+            row_in_link = is_link_container(header_row) or header_row.find_parent(is_link_container) is not None
             # 仅查找直接子元素作为 Cell，防止递归匹配导致内容重复 (列重复/数据堆叠)
             for child in header_row.find_all(recursive=False):
                 # 检查是否为 Cell 样式的 div
-                classes = str(child.get('class', []))
-                if 'table-view-header-cell' in classes or \
-                   'table-view-cell' in classes or \
-                   child.get('role') in ['columnheader', 'cell', 'gridcell']:
+                if _class_has(child, 'table-view-header-cell', 'table-view-cell') or \
+                   child.get('role') in _HEADER_CELL_ROLES:
                     
-                    header_cells.append(process_node(child).strip().replace('\n', ' ').replace('|', '\\|'))
+                    header_cells.append(process_node(child, row_in_link).strip().replace('\n', ' ').replace('|', '\\|'))
             
             # 如果没有找到直接子元素 Cell，可能这就不是一个 Row，或者结构非常特殊
             # 这种情况下尝试查找第一层级的 Cell (深度为1)
             if not header_cells:
-                 for cell in header_row.select('div[class*="table-view-header-cell"], div[class*="table-view-cell"]'):
+                 for cell in header_row.find_all(_class_contains('div', 'table-view-header-cell', 'table-view-cell')):
                      # 防止无限递归，只取第一层匹配
-                     if 'table-view-cell' in str(cell.parent.get('class', [])): continue 
+                     if _class_has(cell.parent, 'table-view-cell'): continue 
                      header_cells.append(process_node(cell).strip().replace('\n', ' ').replace('|', '\\|'))
 
             if not header_cells: continue
@@ -415,12 +728,11 @@ class WebReader:
             
             if next_sibling:
                 # 可能是 Body 容器
-                classes = str(next_sibling.get('class', []))
-                if 'table-view-body' in classes or 'table-body' in classes:
+                if _class_has(next_sibling, 'table-view-body', 'table-body'):
                     rows_container = next_sibling
                     is_independent_body = True
                 # 或者直接就是 Row (如果是一个扁平列表)
-                elif 'table-view-row' in classes:
+                elif _class_has(next_sibling, 'table-view-row'):
                     rows_container = next_sibling.parent 
             
             # 如果没找到明确的 Body，尝试在 header_container 的父级中查找所有 rows
@@ -428,26 +740,42 @@ class WebReader:
                 rows_container = header_container.parent
                 
             if rows_container:
-                # 在容器中查找所有 row
-                raw_rows_selection = rows_container.select('div[class*="table-view-row"]')
-                
-                # 去重：过滤掉嵌套的 row (只保留最顶层的 row)
-                all_possible_rows = []
-                for row in raw_rows_selection:
-                    is_nested = False
-                    parent = row.parent
-                    while parent and parent != rows_container:
-                        if 'table-view-row' in str(parent.get('class', [])):
-                            is_nested = True
-                            break
-                        parent = parent.parent
-                    if not is_nested:
-                        all_possible_rows.append(row)
+                # 多个表头平铺在同一容器时会共用 rows_container，同一容器的行只查找一次
+                cached = container_rows.get(id(rows_container))
+                if cached is not None:
+                    all_possible_rows = cached[1]
+                else:
+                    # 在容器中查找所有 row
+                    raw_rows_selection = rows_container.find_all(_class_contains('div', 'table-view-row'))
+                    
+                    # 去重：过滤掉嵌套的 row (只保留最顶层的 row)
+                    # 向上查找到容器即停止: 必须按身份比较，Tag 的 != 会逐层比较整棵子树的内容
+                    all_possible_rows = []
+                    for row in raw_rows_selection:
+                        is_nested = False
+                        parent = row.parent
+                        while parent is not None and parent is not rows_container:
+                            if _class_has(parent, 'table-view-row'):
+                                is_nested = True
+                                break
+                            parent = parent.parent
+                        if not is_nested:
+                            all_possible_rows.append(row)
+                    # 同时保存容器本身，保证其存活期间 id 不会被复用
+                    container_rows[id(rows_container)] = (rows_container, all_possible_rows)
                 
                 # 找到下一个表头的位置 (用于截断 - 仅当多个表格平铺在同一个容器时需要)
-                current_header_idx = headers.index(header_row)
+                # 下标由 enumerate 给出: list.index 不仅是线性查找，还会用 Tag 的 == 逐个比较整棵子树
                 next_header_row = headers[current_header_idx + 1] if current_header_idx + 1 < len(headers) else None
                 
+                # 只有当下一个 header 也在这个 container 里 (或就是它本身) 时才需要截断
+                # 每个表头判断一次，沿 header 的祖先链按身份比较；
+                # 而 `in rows_container.descendants` 每行都会遍历整棵子树，且 Tag 的 == 会逐层比较内容
+                truncate_at_next_header = next_header_row is not None and (
+                    next_header_row is rows_container
+                    or any(parent is rows_container for parent in next_header_row.parents)
+                )
+                
                 # 过滤逻辑
                 for row in all_possible_rows:
                     # 1. 前置检查 (仅当 Header 和 Row 混在一个容器时需要)
@@ -461,29 +789,26 @@ class WebReader:
                         pass
                     
                     # 2. 截断检查 (防止吞掉下一个表格)
-                    # 只有当下一个 header 也在这个 container 里时才需要截断
-                    if next_header_row:
-                        # 检查下一个 header 是否也在当前的 rows_container 里 (或是其后代)
-                        # 如果 next_header 在这里，那我们需要在遇到它之前停止
-                        if next_header_row in rows_container.descendants or next_header_row == rows_container:
-                             if row.sourceline and next_header_row.sourceline and row.sourceline >= next_header_row.sourceline:
-                                break
+                    # 如果 next_header 在这里，那我们需要在遇到它之前停止
+                    if truncate_at_next_header:
+                        if row.sourceline and next_header_row.sourceline and row.sourceline >= next_header_row.sourceline:
+                            break
                     
                     # 提取单元格 (同样应用非递归策略)
                     row_cells = []
                     cell_idx = 0
+                    row_in_link = is_link_container(row) or row.find_parent(is_link_container) is not None
                     for child in row.find_all(recursive=False):
-                        classes = str(child.get('class', []))
-                        if 'table-view-cell' in classes or \
-                           child.get('role') in ['cell', 'gridcell']:
+                        if _class_has(child, 'table-view-cell') or \
+                           child.get('role') in _ROW_CELL_ROLES:
                             
-                            row_cells.append(process_node(child).strip().replace('\n', ' ').replace('|', '\\|'))
+                            row_cells.append(process_node(child, row_in_link).strip().replace('\n', ' ').replace('|', '\\|'))
                             cell_idx += 1
                     
                     # Fallback (同 Header)
                     if not row_cells:
-                        for cell in row.select('div[class*="table-view-cell"]'):
-                            if 'table-view-cell' in str(cell.parent.get('class', [])): continue 
+                        for cell in row.find_all(_class_contains('div', 'table-view-cell')):
+                            if _class_has(cell.parent, 'table-view-cell'): continue 
                             row_cells.append(process_node(cell).strip().replace('\n', ' ').replace('|', '\\|'))
                     
                     if row_cells:
@@ -501,19 +826,21 @@ class WebReader:
             # 过滤全空列 (飞书常有 checkbox 列)
             if valid_rows:
                 num_cols = len(header_cells)
-                # 检查每一列是否全空
-                cols_to_keep = []
-                for c in range(num_cols):
-                    has_content = False
-                    for r in valid_rows:
-                        if c < len(r) and r[c].strip():
-                            has_content = True
-                            break
-                    if has_content:
-                        cols_to_keep.append(c)
+                # 检查每一列是否全空: 逐行扫描一次，记录每列是否出现过内容
+                # (单元格在提取时已 strip，非空即有内容；所有列都有内容后提前结束)
+                present = bytearray(num_cols)
+                remaining = num_cols
+                for r in valid_rows:
+                    for c, cell in enumerate(r[:num_cols]):
+                        if cell and not present[c]:
+                            present[c] = 1
+                            remaining -= 1
+                    if not remaining:
+                        break
                 
                 # 重构行数据，只保留有效列
-                if len(cols_to_keep) < num_cols:
+                if remaining:
+                    cols_to_keep = [c for c in range(num_cols) if present[c]]
                     new_valid_rows = []
                     for r in valid_rows:
                         new_row = [r[i] for i in cols_to_keep if i < len(r)]
@@ -524,17 +851,13 @@ class WebReader:
             
             # 生成 Markdown
             max_cols = max(len(r) for r in valid_rows)
-            md_lines = []
-            
-            # 表头
-            header_line = valid_rows[0] + [''] * (max_cols - len(valid_rows[0]))
-            md_lines.append('| ' + ' | '.join(header_line) + ' |')
-            md_lines.append('| ' + ' | '.join(['---'] * max_cols) + ' |')
+            # 每行先补齐到 max_cols，再套用同一个模板；整张表最后一次 join
+            for row in valid_rows:
+                row.extend([''] * (max_cols - len(row)))
+            md_lines = [f"| {' | '.join(row)} |" for row in valid_rows]
             
-            # 内容
-            for row in valid_rows[1:]:
-                row += [''] * (max_cols - len(row))
-                md_lines.append('| ' + ' | '.join(row) + ' |')
+            # 表头之后插入分隔行
+            md_lines.insert(1, f"| {' | '.join(['---'] * max_cols)} |")
 
             table_md = '\n' + '\n'.join(md_lines) + '\n'
             
@@ -561,22 +884,38 @@ class WebReader:
 
 
         # 3. 遍历块级元素
-        block_tags = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'blockquote', 'pre', 'div', 'section'}
         text_parts = []
-        processed_elements = set()
+        last_stripped = None # text_parts[-1].strip() 的缓存，用于相邻重复块判断
 
-        for element in main_content.find_all(list(block_tags)):
-            if element in processed_elements:
+        # 单次前序 DFS (显式栈，文档顺序与 find_all 一致):
+        # 代码块/表格占位符直接不压入子节点，从而整棵子树被跳过，
+        # 无需再用 processed_elements 集合做标记 (Tag 的 hash 需要序列化整棵子树)
+        # 栈中同时携带最近的带 data-block-type 的祖先 (针对飞书桌面端 DOM 结构)，
+        # 以及是否处于链接容器内 (供 process_node 使用)，
+        # 向下遍历时顺手传递，避免每个块元素都 find_parent 逐级向上查找
+        if main_content.has_attr('data-block-type'):
+            root_block = main_content
+        else:
+            root_block = main_content.find_parent(lambda tag: tag.has_attr('data-block-type'))
+        root_in_link = is_link_container(main_content) or main_content.find_parent(is_link_container) is not None
+        stack = [(child, root_block, root_in_link) for child in reversed(main_content.contents) if isinstance(child, Tag)]
+        while stack:
+            element, parent_block, in_link = stack.pop()
+            attrs = element.attrs
+            child_block = element if 'data-block-type' in attrs else parent_block
+            child_in_link = in_link or is_link_container(element)
+            child_tags = [child for child in element.contents if isinstance(child, Tag)]
+            if element.name not in _BLOCK_TAGS:
+                stack.extend((child, child_block, child_in_link) for child in reversed(child_tags))
                 continue
                 
             # --- 优先检查是否为表格占位符 ---
-            placeholder_id = element.get('data-table-placeholder')
+            placeholder_id = attrs.get('data-table-placeholder')
             if placeholder_id and placeholder_id in table_markdown_map:
                 # 直接插入预存的 Markdown 表格
                 text_parts.append(table_markdown_map[placeholder_id])
+                last_stripped = text_parts[-1].strip()
                 # 表格是一个整体，其内部元素不需要再遍历
-                for child in element.find_all():
-                    processed_elements.add(child)
                 continue
             
             # 过滤掉包含其他块级元素的容器 (只处理最底层的块)
@@ -584,12 +923,11 @@ class WebReader:
             # 所以我们需要先检查是不是代码块容器
             
             # --- 核心优化: 识别飞书伪标题/代码块 ---
-            classes = element.get('class', [])
+            classes = attrs.get('class', [])
             class_str = ' '.join(classes).lower()
             
-            # 向上查找 data-block-type (针对飞书桌面端 DOM 结构)
+            # 最近祖先的 data-block-type (针对飞书桌面端 DOM 结构)
             block_type = ''
-            parent_block = element.find_parent(lambda tag: tag.has_attr('data-block-type'))
             if parent_block:
                 block_type = parent_block.get('data-block-type', '')
             
@@ -604,9 +942,8 @@ class WebReader:
                 is_code_block = True
             
             # 如果仅仅是 block_type == 'code'，可能是内部的行，我们需要找到最外层的容器
-            # 这里的逻辑比较微妙：find_all 会先返回父级，再返回子级吗？
-            # BS4 find_all 是按文档顺序。父级先于子级。
-            # 所以只要我们处理了父级并标记了子级，就不会重复处理。
+            # 前序遍历保证父级先于子级出栈，
+            # 所以只要我们处理了父级并跳过其子树，就不会重复处理。
             
             if is_code_block:
                 code_content = element.get_text(separator='\n')
@@ -625,11 +962,11 @@ class WebReader:
                 
                 # 精确提取: 尝试找 code 标签或 .code-block-content
                 # 这样可以去除行号等噪音
-                content_container = element.select_one('.code-block-content, code')
+                content_container = element.find(lambda tag: tag.name == 'code' or 'code-block-content' in tag.get('class', []))
                 if content_container:
                      # 智能换行策略：
                      # 1. 优先识别飞书/AceEditor 的行结构 (.ace-line)
-                     ace_lines = content_container.select('.ace-line')
+                     ace_lines = content_container.find_all(class_='ace-line')
                      if ace_lines:
                          lines = []
                          for line in ace_lines:
@@ -654,44 +991,47 @@ class WebReader:
                 
                 final_text = f"\n```{lang}\n{code_content}\n```\n"
                 text_parts.append(final_text)
+                last_stripped = final_text.strip()
                 
-                # 标记所有后代为已处理，防止拆分
-                for child in element.find_all():
-                    processed_elements.add(child)
+                # 不再遍历其后代，防止拆分
                 continue 
 
+            stack.extend((child, child_block, child_in_link) for child in reversed(child_tags))
+
             # 对于非代码块，保持原来的“只处理最底层块”逻辑
-            has_block_children = any(child.name in block_tags for child in element.find_all(recursive=False))
+            has_block_children = any(child.name in _BLOCK_TAGS for child in child_tags)
             # 如果有子块（且不是代码块），说明它是容器，跳过它，等遍历到子块再说
             if has_block_children:
                 continue
             
             # 使用 process_node 获取带格式的文本
-            rich_text = process_node(element).strip()
+            rich_text = process_node(element, in_link).strip()
             
             # 清洗多余空格
-            rich_text = re.sub(r'\s+', ' ', rich_text)
-            rich_text = rich_text.replace(' **', '**').replace('** ', '**') 
+            rich_text = _WS_RE.sub(' ', rich_text)
+            # 大多数块没有加粗，先做一次子串判断，省去两遍 replace 扫描与拷贝
+            if '**' in rich_text:
+                rich_text = rich_text.replace(' **', '**').replace('** ', '**') 
             
             if len(rich_text) < 2:
                 continue
 
             # --- 噪音过滤 ---
-            blacklist = ["附件不支持打印", "文档链接直达", "评论区", "更多分类内容", "前往语雀", "扫码登录", "转到元文档"]
-            if any(noise in rich_text for noise in blacklist):
+            if _NOISE_RE.search(rich_text):
                 continue
             
-            level = 0
-            if element.name.startswith('h'):
-                try: level = int(element.name[1])
-                except: pass
-            elif 'heading-h1' in class_str or 'ace-line-heading-1' in class_str or block_type == 'heading1': level = 1
-            elif 'heading-h2' in class_str or 'ace-line-heading-2' in class_str or block_type == 'heading2': level = 2
-            elif 'heading-h3' in class_str or 'ace-line-heading-3' in class_str or block_type == 'heading3': level = 3
-            elif 'heading-h4' in class_str or 'ace-line-heading-4' in class_str or block_type == 'heading4': level = 4
-            elif 'heading-h5' in class_str or 'ace-line-heading-5' in class_str or block_type == 'heading5': level = 5
-            elif 'heading-h6' in class_str or 'ace-line-heading-6' in class_str or block_type == 'heading6': level = 6
-            elif 'title' in class_str and len(rich_text) < 50: level = 2 
+            level = _HEADING_TAGS.get(element.name, 0)
+            if not level:
+                # 飞书标题: class 中的 heading-hN / ace-line-heading-N 或 data-block-type="headingN"，
+                # 同时出现多个时取最高级别 (数字最小)
+                # 大多数块没有 class 或不含 "heading"，先做子串判断再进正则
+                levels = [int(n) for n in _HEADING_CLASS_RE.findall(class_str)] if 'heading' in class_str else []
+                if block_type in _HEADING_BLOCK_TYPES:
+                    levels.append(_HEADING_BLOCK_TYPES[block_type])
+                if levels:
+                    level = min(levels)
+                elif 'title' in class_str and len(rich_text) < 50:
+                    level = 2
             
             # 组装 Markdown
             final_text = rich_text
@@ -711,8 +1051,11 @@ class WebReader:
             elif element.name == 'pre' or block_type == 'code':
                 final_text = f"\n```\n{rich_text}\n```\n"
             
-            if final_text and (not text_parts or text_parts[-1].strip() != final_text.strip()):
-                 text_parts.append(final_text)
+            if final_text:
+                final_stripped = final_text.strip()
+                if final_stripped != last_stripped:
+                    text_parts.append(final_text)
+                    last_stripped = final_stripped
             
         # 兜底
         if len(text_parts) < 3:
@@ -724,178 +1067,324 @@ class WebReader:
         # 链接已在开头提取
         # links = ...
         
+        return self._make_content(title, url, '\n\n'.join(text_parts), links)
+
+    def _make_content(self, title: str, url: str, text: str, links: List[str]) -> Dict[str, Any]:
+        """
+        组装单个页面的抓取结果
+        """
         return {
-            'title': title or urlparse(url).path.split('/')[-1] or 'Untitled',
+            'title': title or urlsplit(url).path.split('/')[-1] or 'Untitled',
             'url': url,
-            'text': '\n\n'.join(text_parts),
+            'text': text,
             'links': links,
-            'crawl_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'crawl_time': datetime.now().isoformat(sep=' ', timespec='seconds')
         }
     
+    async def _extract(self, html: str, url: str) -> Dict[str, Any]:
+        """
+        解析页面内容
+        
+        _extract_text 是纯 CPU 计算，默认 (extract_workers=0) 放到默认线程池解析，
+        受 GIL 限制无法并行，但事件循环仍能按时间片调度，其他 worker 的页面加载与
+        Playwright 通信不会停顿；extract_workers 启用进程池时改在子进程中并行解析。
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._extract_pool
+        if pool is None:
+            return await loop.run_in_executor(None, self._extract_text, html, url)
+        
+        try:
+            return await loop.run_in_executor(pool, _extract_in_worker, html, url)
+        except BrokenProcessPool:
+            # 子进程异常退出: 关闭损坏的进程池 (crawl 结束时不会再看到它)，后续页面退回主进程的线程池解析
+            if self._extract_pool is pool:
+                print("  [WARN] 解析进程池不可用，改为在主进程解析")
+                self._extract_pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await loop.run_in_executor(None, self._extract_text, html, url)
+
+    async def _route_request(self, route):
+        """
+        网络拦截: 中断不需要的资源请求 (图片/媒体/字体、第三方统计)
+        """
+        request = route.request
+        # 子资源 URL 大多唯一 (带长查询串)，直接匹配，不经过 should_exclude_url 的全局缓存
+        if request.resource_type in self._blocked_types or \
+           (self._blocked_url_re is not None and self._blocked_url_re.search(request.url)):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_page(self, context: BrowserContext) -> Page:
+        """
+        创建一个页签 (每个 worker 持有一个，跨 URL 复用)
+        """
+        page = await context.new_page()
+        
+        # 设置超时
+        page.set_default_timeout(self.config['timeout'] * 1000)
+        return page
+
+    async def _fetch_http(self, url: str) -> Optional[str]:
+        """
+        不经过浏览器，直接 HTTP GET 获取静态页面
+        
+        Returns:
+            服务端返回的 HTML；非 HTML、请求失败或看起来需要 JS 渲染时返回 None，
+            由调用方改用 Playwright 抓取
+        """
+        try:
+            async with self._http.get(url) as resp:
+                if resp.status != 200 or 'html' not in resp.content_type:
+                    return None
+                html = await resp.text(errors='replace')
+        except Exception:
+            return None
+        
+        # SPA 外壳 (空的挂载点 / 首屏状态脚本): 正文要靠 JS 渲染，交给浏览器
+        if _SPA_SHELL_RE.search(html):
+            return None
+        return html
+
     async def _fetch_page(
         self, 
-        context: BrowserContext, 
-        sem: asyncio.Semaphore, 
+        page: Page, 
         url: str
     ) -> Optional[str]:
         """
         使用 Playwright 获取页面内容
         
         Args:
-            context: 浏览器上下文
-            sem: 并发信号量
+            page: 当前 worker 复用的页签
             url: 页面URL
         
         Returns:
             渲染后的HTML内容，失败返回None
         """
-        page: Optional[Page] = None
-        async with sem:  # 限制并发打开的 Page 数量
+        try:
+            # 复用页签: 先恢复基准视口，避免上一个页面的视口扩张带入下一个页面
+            await page.set_viewport_size(_BASE_VIEWPORT)
+            
+            # 访问页面
+            # wait_until 可选: 'load', 'domcontentloaded', 'networkidle'
+            await page.goto(url, wait_until=self.config.get('wait_until', 'domcontentloaded'))
+            
+            # 额外的智能等待 (用于等待 JS 渲染)
+            js_wait = self.config.get('js_render_wait', 1.0)
+            if js_wait > 0:
+                await asyncio.sleep(js_wait)
+            
+            # 静态页面等无需全量渲染的站点: 不做 8 秒以上的预热与滚动，直接取 HTML
+            if not self._needs_full_render(url):
+                return await page.content()
+            
+            # --- 智能滚动 (终极版 v4: 稳健的全量渲染) ---
+            print(f"  [INFO] 尝试全量渲染策略...")
+            
             try:
-                page = await context.new_page()
-                
-                # 设置超时
-                page.set_default_timeout(self.config['timeout'] * 1000)
-                
-                # 访问页面
-                # wait_until 可选: 'load', 'domcontentloaded', 'networkidle'
-                await page.goto(url, wait_until=self.config.get('wait_until', 'domcontentloaded'))
+                # 0. 预热 (飞书可能需要一点时间来撑开容器)
+                # 先给个较大的初始值，诱导它渲染
+                await page.set_viewport_size({"width": 1920, "height": 3000})
                 
-                # 额外的智能等待 (用于等待 JS 渲染)
-                js_wait = self.config.get('js_render_wait', 1.0)
-                if js_wait > 0:
-                    await asyncio.sleep(js_wait)
+                # 1. 循环检测真实高度 (防止刚进去时是骨架屏，高度很小)
+                # 在页面内轮询，整个等待只需一次 evaluate 往返；
+                # 先保留 5 秒预热下限，之后正文高度超过 2000 (认为是一个合理的展开高度) 立即返回，
+                # 否则最多等待 10 秒 (即原先固定预热 5 秒 + 轮询 5 秒的上限)
+                full_height = await page.evaluate(
+                    _WAIT_FOR_HEIGHT_JS, {'minHeight': 2000, 'minWait': 5000, 'timeout': 10000, 'interval': 200}
+                )
                 
-                # --- 智能滚动 (终极版 v4: 稳健的全量渲染) ---
-                print(f"  [INFO] 尝试全量渲染策略...")
-                
-                try:
-                    # 0. 预热 (飞书可能需要一点时间来撑开容器)
-                    # 先给个较大的初始值，诱导它渲染
-                    await page.set_viewport_size({"width": 1920, "height": 3000})
-                    await asyncio.sleep(5)
-                    
-                    # 1. 循环检测真实高度 (防止刚进去时是骨架屏，高度很小)
-                    full_height = 0
-                    for _ in range(5):
-                        h = await page.evaluate("document.body.scrollHeight")
-                        if h > 2000: # 认为是一个合理的展开高度
-                            full_height = h
-                            break
-                        await asyncio.sleep(1)
-                    
-                    # 如果还是没拿到，就用最后一次的值，或者保底 5000
-                    full_height = full_height or await page.evaluate("document.body.scrollHeight")
-                    
-                    if full_height > 0:
+                if full_height > 0:
 
-                         target_height = min(full_height + 2000, 30000) # 多加2000冗余
-                         await page.set_viewport_size({"width": 1920, "height": target_height})
-                         await asyncio.sleep(3) # 视口变大后，React 需要时间重绘
-                except Exception as e:
-                    print(f"  [WARN] 视口调整失败: {e}")
+                     target_height = min(full_height + 2000, 30000) # 多加2000冗余
+                     await page.set_viewport_size({"width": 1920, "height": target_height})
+                     # 视口变大后，React 需要时间重绘: 至少等待 2 秒且正文高度稳定 1 秒即认为完成，最多 3 秒
+                     await page.evaluate(
+                         _WAIT_FOR_STABLE_HEIGHT_JS,
+                         {'stableFor': 1000, 'minWait': 2000, 'timeout': 3000, 'interval': 200}
+                     )
+            except Exception as e:
+                print(f"  [WARN] 视口调整失败: {e}")
 
-                # 2. 依然执行滚动，确保触发那些基于 scroll 事件的懒加载
-                # (即使视口变大了，有些图片还是需要滚动事件才能加载)
-                print(f"  [INFO] 开始模拟鼠标滚轮滚动 (确保懒加载触发)...")
+            # 2. 依然执行滚动，确保触发那些基于 scroll 事件的懒加载
+            # (即使视口变大了，有些图片还是需要滚动事件才能加载)
+            print(f"  [INFO] 开始模拟鼠标滚轮滚动 (确保懒加载触发)...")
+            
+            # 将鼠标移动到页面中心
+            try:
+               viewport = page.viewport_size
+               if viewport:
+                   await page.mouse.move(viewport['width'] * 0.6, min(viewport['height'] * 0.5, 800))
+            except: pass
+            
+            # 快速滚动一遍 (因为视口已经很大了，可能不需要滚太多次，但为了保险还是滚一遍)
+            last_height = 0
+            no_change_count = 0
+            loop = asyncio.get_running_loop()
+            scroll_timeout = self.config.get('scroll_timeout')
+            scroll_deadline = loop.time() + scroll_timeout if scroll_timeout else None
+            scroll_interval = self.config.get('scroll_interval', 0.5)
+            stable_since = loop.time()
+            
+            settle_args = {'quietFor': 150, 'timeout': scroll_interval * 1000}
+            
+            for i in range(50):
+                await page.mouse.wheel(0, 1000)
                 
-                # 将鼠标移动到页面中心
-                try:
-                   viewport = page.viewport_size
-                   if viewport:
-                       await page.mouse.move(viewport['width'] * 0.6, min(viewport['height'] * 0.5, 800))
-                except: pass
+                # 在页面内等待懒加载内容插入完成，并在同一次 evaluate 中取回高度等度量
+                # 如果当前高度已经小于视口高度，且不再变化，说明真的到底了且全显示了
+                new_height, vp_height, at_bottom = await page.evaluate(_SCROLL_SETTLE_JS, settle_args)
                 
-                # 快速滚动一遍 (因为视口已经很大了，可能不需要滚太多次，但为了保险还是滚一遍)
-                last_height = 0
-                no_change_count = 0
+                if new_height == last_height:
+                    no_change_count += 1
+                    # 滚动容器确实滚到了底部且高度稳定 2 轮即可结束；否则最多再等 5 轮
+                    # 每轮可能因 DOM 提前平静而早于 scroll_interval 返回，稳定时长另按墙钟计算，
+                    # 不短于原先固定间隔下 N 轮的等待，给网络加载的懒加载内容留足时间
+                    rounds = 2 if at_bottom else 5
+                    if no_change_count >= rounds and \
+                       loop.time() - stable_since >= rounds * scroll_interval:
+                        break
+                else:
+                    no_change_count = 0
+                    last_height = new_height
+                    stable_since = loop.time()
+                    # 如果发现高度变大了，再次扩张视口 (如果还没到上限)
+                    # 一次多扩 2000 冗余 (与预热时一致)，懒加载逐步增高时不必每轮都调整视口
+                    if new_height > vp_height and vp_height < 30000:
+                         try:
+                            await page.set_viewport_size({"width": 1920, "height": min(new_height + 2000, 30000)})
+                         except: pass
                 
-                for i in range(50):
-                    await page.mouse.wheel(0, 1000)
-                    await asyncio.sleep(0.5) 
-                    
-                    # 检查高度
-                    new_height = await page.evaluate("document.body.scrollHeight")
+                # 可选的总滚动时间上限 (默认不限时，与原先一样最多滚 50 轮)
+                if scroll_deadline is not None and loop.time() >= scroll_deadline:
+                    break
                     
-                    # 如果当前高度已经小于视口高度，且不再变化，说明真的到底了且全显示了
-                    current_scroll = await page.evaluate("window.scrollY")
-                    vp_height = page.viewport_size['height']
-                    
-                    if new_height == last_height:
-                        no_change_count += 1
-                        if no_change_count >= 5:
-                            break
-                    else:
-                        no_change_count = 0
-                        last_height = new_height
-                        # 如果发现高度变大了，再次扩张视口 (如果还没到上限)
-                        if new_height > vp_height and new_height < 30000:
-                             try:
-                                await page.set_viewport_size({"width": 1920, "height": new_height + 500})
-                             except: pass
-                        
 
 
-                print("  [INFO] 全量渲染处理完成")
-                
-                # --- 关键修复: 滚回顶部 ---
-                # 很多虚拟滚动列表在滚到底部后，会卸载顶部的 DOM 以节省内存。
-                # 我们必须滚回顶部，确保开头的章节 (1.1, 1.2) 被重新渲染。
-                # 由于我们前面扩大了 viewport，理论上滚回顶部后，只要高度够大，
-                # 应该能同时保留顶部和中间的内容 (如果内存允许)。
+            print("  [INFO] 全量渲染处理完成")
+            
+            # --- 关键修复: 滚回顶部 ---
+            # 很多虚拟滚动列表在滚到底部后，会卸载顶部的 DOM 以节省内存。
+            # 我们必须滚回顶部，确保开头的章节 (1.1, 1.2) 被重新渲染。
+            # 由于我们前面扩大了 viewport，理论上滚回顶部后，只要高度够大，
+            # 应该能同时保留顶部和中间的内容 (如果内存允许)。
+            if self.config.get('debug'):
                 print("  [DEBUG] 正在滚回顶部以重新渲染首屏内容...")
-                
-                # --- 智能滚顶: 查找真实滚动容器 ---
-                # 很多应用(如飞书)是 div 滚动而不是 window 滚动
-                await page.evaluate("""() => {
-                    window.scrollTo(0, 0);
-                    
-                    // 找到所有可滚动的元素
-                    const scrollables = [];
-                    document.querySelectorAll('*').forEach(el => {
-                        if (el.scrollHeight > el.clientHeight && el.clientHeight > 0) {
-                            scrollables.push(el);
-                        }
-                    });
-                    
-                    // 假设最大的那个是主滚动区
-                    if (scrollables.length > 0) {
-                        scrollables.sort((a, b) => b.scrollHeight - a.scrollHeight);
-                        scrollables[0].scrollTo(0, 0);
-                        console.log('Scrolled container:', scrollables[0].className);
-                    }
-                }""")
-                await asyncio.sleep(2.0)
-                
+            
+            # --- 智能滚顶: 查找真实滚动容器 ---
+            # 很多应用(如飞书)是 div 滚动而不是 window 滚动
+            # 滚顶后在页面内等待首屏内容重新渲染完成 (DOM 平静 300ms)，最多等待 2 秒
+            await page.evaluate(_SCROLL_TO_TOP_JS, {'quietFor': 300, 'timeout': 2000})
+            
 
-                
-                # 3. 再次等待 JS 渲染
-                js_wait = self.config.get('js_render_wait', 1.0)
-                if js_wait > 0:
-                    await asyncio.sleep(js_wait)
-                
+            
+            # 3. 再次等待 JS 渲染
+            js_wait = self.config.get('js_render_wait', 1.0)
+            if js_wait > 0:
+                await asyncio.sleep(js_wait)
+            
 
 
-                content = await page.content()
-                return content
-                
-            except Exception as e:
-                print(f"  ⚠️  抓取失败: {url} - {str(e)}")
-                return None
-            finally:
-                if page:
-                    await page.close()
+            content = await page.content()
+            return content
+            
+        except Exception as e:
+            print(f"  ⚠️  抓取失败: {url} - {str(e)}")
+            return None
     
-    async def _crawl_recursive(
+    async def _crawl_worker(self, context: BrowserContext, queue: asyncio.Queue):
+        """
+        抓取工作协程: 循环从队列取出 (url, depth) 处理，新发现的链接放回队列
+        
+        并发页签数即 worker 数量，无需额外信号量；
+        待抓取链接只以 (url, depth) 元组排队，不会为每个链接常驻一个协程。
+        """
+        # 每个 worker 固定持有一个页签，逐个 URL 复用，省去每页 new_page/close 的开销
+        # 页签在处理条目时按需创建: 创建失败只记为该 URL 失败并照常 task_done，
+        # worker 不会退出，queue.join() 也就不会因为少了消费者而永远挂起
+        page = None
+        crashed = False
+        
+        def on_crash(_page):
+            nonlocal crashed
+            crashed = True
+        
+        try:
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if page is None or page.is_closed() or crashed: # 首次使用、页签崩溃或被关闭时重建
+                        if page is not None and not page.is_closed():
+                            try:
+                                await page.close()
+                            except Exception:
+                                pass
+                        page = await self._new_page(context)
+                        crashed = False
+                        # 渲染进程崩溃不会把页签标记为已关闭，之后的 goto 都会失败，需在下一个条目前换新页签
+                        page.once('crash', on_crash)
+                    await self._crawl_page(page, queue, url, depth)
+                except Exception as e:
+                    print(f"  ⚠️  处理失败: {url} - {str(e)}")
+                finally:
+                    queue.task_done()
+        finally:
+            if page is not None and not page.is_closed():
+                await page.close()
+
+    def _is_new_content(self, content: Dict[str, Any]) -> bool:
+        """
+        判断页面正文是否与已保存的页面重复 (标题与正文完全相同)
+        
+        不同 URL 返回同一内容 (如无权限提示页、镜像页) 时只保留第一份，
+        避免重复写盘与链接替换。只保存 16 字节摘要，不常驻正文副本。
+        """
+        if not self.config.get('dedup_content', False):
+            return True
+        digest = hashlib.blake2b(
+            f"{content['title']}\0{content['text']}".encode('utf-8'), digest_size=16
+        ).digest()
+        if digest in self._content_digests:
+            print(f"  [DEDUP] 内容与已抓取页面重复，不再保存: {content['url']}")
+            return False
+        self._content_digests.add(digest)
+        return True
+
+    def _cache_variant(self) -> str:
+        """
+        计算影响页面提取结果的配置指纹，用作页面缓存的主键前缀
+        
+        解析设置以及决定渲染方式 (是否执行 JS、是否完整渲染、是否 HTTP 直取) 的配置
+        任一变化，缓存中的旧结果都不再命中；提取结果与输出格式无关，切换格式仍可复用缓存
+        """
+        settings = {key: self.config.get(key) for key in _CACHE_VARIANT_KEYS}
+        raw = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+    async def _report_progress(self, url: str, depth: int):
+        """
+        上报进度: 有回调时调用回调 (同步或异步均可)，否则打印到控制台
+        
+        直接调用回调并判断返回值是否为协程，无需 inspect 检查函数签名，
+        也能正确处理 functools.partial 等包装过的异步回调
+        """
+        if self.on_progress:
+            result = self.on_progress(self.completed_count, self.config['max_pages'], url, depth)
+            if asyncio.iscoroutine(result):
+                await result
+        else:
+             print_progress(self.completed_count, self.config['max_pages'], url, depth)
+
+    async def _crawl_page(
         self, 
-        context: BrowserContext,
-        sem: asyncio.Semaphore,
+        page: Page,
+        queue: asyncio.Queue,
         url: str, 
-        depth: int,
-        start_domain: str
+        depth: int
     ):
         """
-        递归抓取页面
+        抓取单个页面，并将符合条件的子链接加入队列
         """
         # 检查限制条件 (深度、总数、已访问)
         if depth > self.config['max_depth']:
@@ -910,9 +1399,9 @@ class WebReader:
             return
             
         # 检查域名和排除规则
-        if self.config['same_domain_only'] and not is_same_domain(url, f"https://{start_domain}"):
+        if self.config['same_domain_only'] and not is_same_domain(url, self._start_origin):
             return
-        if should_exclude_url(url, self.config['exclude_patterns']):
+        if should_exclude_url(url, self._exclude_re):
             return
         
         # 标记已访问
@@ -921,69 +1410,70 @@ class WebReader:
         
         # 移除了此处的进度回调，改为在处理完成后回调，确保进度条"从0开始，完成一个涨一个"
 
-        # 获取内容
-        html = await self._fetch_page(context, sem, url)
-        if not html:
-            # 即使失败也算完成一个任务
-            self.completed_count += 1
-            if self.on_progress:
-                if inspect.iscoroutinefunction(self.on_progress):
-                    await self.on_progress(self.completed_count, self.config['max_pages'], url, depth)
-                else:
-                    self.on_progress(self.completed_count, self.config['max_pages'], url, depth)
-            else:
-                 print_progress(self.completed_count, self.config['max_pages'], url, depth)
-            return
+        # 命中页面缓存 (上次运行已抓取) 则跳过加载与解析
+        content = self._cache.get(unique_key) if self._cache else None
+        from_cache = content is not None
+        if from_cache:
+            # 抓取时间记录本次运行，而不是首次写入缓存的时间
+            content['crawl_time'] = datetime.now().isoformat(sep=' ', timespec='seconds')
+        
+        if not from_cache:
+            # 获取内容: 无需完整渲染的页面先尝试直接 HTTP 获取，失败再交给浏览器
+            html = None
+            if self._http is not None and not self._needs_full_render(url):
+                html = await self._fetch_http(url)
+            if html is None:
+                html = await self._fetch_page(page, url)
+            if not html:
+                # 即使失败也算完成一个任务
+                self.completed_count += 1
+                await self._report_progress(url, depth)
+                return
+            
+            # 提取数据
+            content = await self._extract(html, url)
+            if self._cache:
+                self._cache.put(unique_key, depth, content)
         
-        # 提取数据
-        content = self._extract_text(html, url)
-        if content['text']:
+        if content['text'] and self._is_new_content(content):
             self.results.append(content)
             
         # 页面处理完成 (成功) -> 增加进度
         self.completed_count += 1
-        if self.on_progress:
-            if inspect.iscoroutinefunction(self.on_progress):
-                await self.on_progress(self.completed_count, self.config['max_pages'], url, depth)
-            else:
-                self.on_progress(self.completed_count, self.config['max_pages'], url, depth)
-        else:
-             print_progress(self.completed_count, self.config['max_pages'], url, depth)
-        
-        # 延迟 (Playwright模式下通常也不需要太长时间，因为本身就很慢)
-        delay = self.config.get('delay', 1.0)
-        if delay > 0:
-            await asyncio.sleep(delay)
+        await self._report_progress(url, depth)
         
-        # 递归抓取子链接
-        tasks = []
+        # 子链接入队 (先入队再等待延迟，空闲的 worker 可以立即开始处理)
+        # 已达页面上限后 visited_urls 只增不减，再入队的链接只会被直接丢弃
+        can_schedule = depth + 1 <= self.config['max_depth'] and \
+            len(self.visited_urls) < self.config['max_pages']
         self.link_tree[url] = [] # Initialize children list
+        children_seen: Set[str] = set() # 与 link_tree[url] 同步，O(1) 判断子链接是否已记录
         
         for link in content['links']:
             # 基础过滤
-            if self.config['same_domain_only'] and not is_same_domain(link, f"https://{start_domain}"):
+            if self.config['same_domain_only'] and not is_same_domain(link, self._start_origin):
                 continue
-            if should_exclude_url(link, self.config['exclude_patterns']):
+            if should_exclude_url(link, self._exclude_re):
                 continue
             
             # 记录到结构树 (只要符合域名规则，就算子节点，用于后续排序)
-            if link not in self.link_tree[url]:
+            if link not in children_seen:
+                children_seen.add(link)
                 self.link_tree[url].append(link)
 
-            # 递归任务创建
-            if depth + 1 <= self.config['max_depth']:
-                if link not in self.visited_urls:
-                     task = asyncio.create_task(
-                         self._crawl_recursive(context, sem, link, depth + 1, start_domain)
-                     )
-                     tasks.append(task)
-        
-        # 等待所有子任务 (注意：这会变成深度优先的变体，实际执行顺序取决于调度)
-        # 为了避免无限并发任务导致栈溢出或内存过大，
-        # 在递归深度较大时，这种写法可能需要优化为队列模式。
-        # 但考虑到 max_depth 通常很小 (2-3)，直接递归 + await 是可以接受的。
-        if tasks:
-            await asyncio.gather(*tasks)
+            # 已访问或已排队的链接 (按唯一Key判断) 不再入队
+            if can_schedule:
+                link_key = self._get_unique_key(link)
+                if link_key in self.visited_keys or link_key in self._scheduled_keys:
+                    continue
+                self._scheduled_keys.add(link_key)
+                queue.put_nowait((link, depth + 1))
+        
+        # 延迟 (Playwright模式下通常也不需要太长时间，因为本身就很慢)
+        # 缓存命中没有访问网站，无需延迟
+        delay = self.config.get('delay', 1.0)
+        if delay > 0 and not from_cache:
+            await asyncio.sleep(delay)
     
     async def crawl(self, start_url: str, on_progress=None) -> List[Dict[str, Any]]:
         """
@@ -1002,52 +1492,97 @@ class WebReader:
         print("=" * 60)
         
         start_domain = get_domain(start_url)
+        self._start_origin = f"https://{start_domain}" # 同域判断的基准，避免每个链接重新拼接
+        
+        # 缓存、解析进程池与 HTTP 会话在启动浏览器之前创建，统一在外层 finally 中释放，
+        # 浏览器启动失败等异常也不会泄漏这些资源
+        try:
+            # 页面缓存: 复用之前运行已抓取的页面
+            if self.config.get('cache_path'):
+                self._cache = PageCache(
+                    self.config['cache_path'], self.config.get('cache_ttl', 0), self._cache_variant()
+                )
+        
+            # 解析进程池: 每个子进程初始化一个独立的 WebReader 用于 _extract_text
+            # 每个抓取 worker 同时最多只有一个页面在解析，进程数超过并发数没有意义
+            extract_workers = self.config.get('extract_workers')
+            if extract_workers is None:
+                extract_workers = min(self.config.get('concurrency', 5), os.cpu_count() or 1)
+            if extract_workers:
+                # 子进程用 spawn 启动: 服务端在多线程进程中调用 crawl，fork 会继承其他线程持有的锁
+                self._extract_pool = ProcessPoolExecutor(
+                    max_workers=extract_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_extract_worker,
+                    initargs=(self.config,)
+                )
         
-        # 启动 Playwright
-        async with async_playwright() as p:
-            # 启动浏览器
-            browser = await p.chromium.launch(
-                headless=self.config.get('headless', True),
-                args=['--no-sandbox', '--disable-setuid-sandbox'] # Linux/Docker 环境常用，Windows这里加上也没事
-            )
+            # HTTP 直取: 所有 worker 共享一个带连接池的会话
+            if self.config.get('http_first'):
+                self._http = aiohttp.ClientSession(
+                    headers={'User-Agent': self._get_user_agent()},
+                    timeout=aiohttp.ClientTimeout(total=self.config['timeout'])
+                )
+        
+            # 启动 Playwright
+            async with async_playwright() as p:
+                # 启动浏览器
+                launch_args = list(_LAUNCH_ARGS)
+                if 'image' in self._blocked_types:
+                    # 在渲染引擎层面禁用图片: 图片请求不再发出，也就不必逐个经过路由拦截回调
+                    launch_args.append('--blink-settings=imagesEnabled=false')
+                browser = await p.chromium.launch(
+                    headless=self.config.get('headless', True),
+                    args=launch_args
+                )
             
-            # 创建上下文 (可以在这里注入 Cookie 或设置 UserAgent)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                viewport={'width': 1920, 'height': 1080},
-                locale='zh-CN'
-            )
+                # 创建上下文 (可以在这里注入 Cookie 或设置 UserAgent)
+                context = await browser.new_context(
+                    user_agent=self._get_user_agent(),
+                    viewport=_BASE_VIEWPORT,
+                    locale='zh-CN',
+                    java_script_enabled=self.config.get('javascript_enabled', True),
+                    # Service Worker 发出的请求不经过 context.route，启用拦截时必须禁用，否则规则会被绕过
+                    service_workers='block' if (self._blocked_types or self._blocked_url_re) else 'allow'
+                )
             
-            # 信号量限制并发页签数
-            sem = asyncio.Semaphore(self.config.get('concurrency', 5))
+                # 在上下文级别统一注册一次网络拦截，对所有页签生效
+                if self._blocked_types or self._blocked_url_re:
+                    await context.route("**/*", self._route_request)
             
-            try:
-                # 开始递归
-                await self._crawl_recursive(context, sem, start_url, 0, start_domain)
-            finally:
-                await context.close()
-                await browser.close()
+                # 广度优先的工作队列: 由 concurrency 个常驻 worker 并发消费
+                queue: asyncio.Queue = asyncio.Queue()
+                queue.put_nowait((start_url, 0))
+                workers = [
+                    asyncio.create_task(self._crawl_worker(context, queue))
+                    for _ in range(self.config.get('concurrency', 5))
+                ]
+            
+                try:
+                    # 等待队列清空 (所有已入队的页面都处理完毕)
+                    await queue.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+                    await context.close()
+                    await browser.close()
+        finally:
+            if self._extract_pool is not None:
+                self._extract_pool.shutdown()
+                self._extract_pool = None
+            if self._cache is not None:
+                self._cache.close()
+                self._cache = None
+            if self._http is not None:
+                await self._http.close()
+                self._http = None
         
         print("=" * 60)
         print(f"[SUCCESS] 抓取完成! 共抓取 {len(self.results)} 个页面\n")
         
         return self.results
     
-    def save_results(self, output_dir: str = None):
-        """
-        保存抓取结果，并执行本地链接替换
-        (支持保序：按 DFS 顺序生成文件名)
-        """
-        from utils import create_output_dir
-        
-        if not self.results:
-            print("[WARN]  没有可保存的内容")
-            return
-        
-        output_dir = output_dir or create_output_dir(self.config['output_dir'])
-        output_format = self.config['output_format']
-        ext = {'markdown': '.md', 'json': '.json', 'txt': '.txt'}[output_format]
-        
     def get_ordered_results(self):
         """
         获取排序后的结果列表 (不保存)
@@ -1058,26 +1593,23 @@ class WebReader:
         # 建立 URL -> Content 映射以便查找
         content_map = {c['url']: c for c in self.results}
         
-        def dfs_collect(u):
-            if u in visited_in_sort: return
+        # 从 Start URL 开始做前序 DFS (显式栈，深层站点不会触发 RecursionError)
+        # 出栈时才判断是否已访问，子链接逆序入栈，顺序与递归版本一致
+        stack = [self.start_url] if getattr(self, 'start_url', None) else []
+        while stack:
+            u = stack.pop()
+            if u in visited_in_sort:
+                continue
             visited_in_sort.add(u)
             
             if u in content_map:
                 ordered_results.append(content_map[u])
             
             # 遍历子链接
-            if u in self.link_tree:
-                for child in self.link_tree[u]:
-                    dfs_collect(child)
-        
-        # 从 Start URL 开始
-        if hasattr(self, 'start_url') and self.start_url:
-             dfs_collect(self.start_url)
-        
-        # 兜底：如果有孤立页面
-        for c in self.results:
-            if c['url'] not in visited_in_sort:
-                ordered_results.append(c)
+            stack.extend(reversed(self.link_tree.get(u, ())))
+        
+        # 兜底：如果有孤立页面 (按原始顺序一次性追加)
+        ordered_results.extend(c for c in self.results if c['url'] not in visited_in_sort)
                 
         return ordered_results
 
@@ -1086,8 +1618,6 @@ class WebReader:
         保存抓取结果，并执行本地链接替换
         (支持保序：按 DFS 顺序生成文件名)
         """
-        from utils import create_output_dir
-        
         if not self.results:
             print("[WARN]  没有可保存的内容")
             return
@@ -1095,12 +1625,10 @@ class WebReader:
         output_dir = output_dir or create_output_dir(self.config['output_dir'])
         
         # 确保目录存在 (针对手动传入路径的情况)
-        import os
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
             
         output_format = self.config['output_format']
-        ext = {'markdown': '.md', 'json': '.json', 'txt': '.txt'}[output_format]
+        ext = _OUTPUT_EXTENSIONS[output_format]
         
         print(f"[INFO] 保存到: {output_dir}")
         
@@ -1110,83 +1638,128 @@ class WebReader:
         print(f"[INFO] 已按阅读顺序重排结果: {len(self.results)} -> {len(ordered_results)}")
         # ---------------------
         
-        # 辅助函数：获取 URL 的唯一 Token (最后一段)
-        def get_url_key(u):
-            if not u: return ""
-            # 移除 query 和 hash
-            u = u.split('#')[0].split('?')[0] 
-            # 移除结尾斜杠
-            if u.endswith('/'): u = u[:-1]
-            # 获取最后一段
-            return u.split('/')[-1]
-
         # 1. 建立 URL Token -> 本地文件名的映射
         token_map = {}
         file_list = [] 
+        write_jobs = [] # (写入函数, 参数)，映射与替换完成后统一并发写盘
+        page_keys = [] # 与 ordered_results 一一对应的 URL Token，供索引复用
         
         for i, content in enumerate(ordered_results, 1):
             base_name = f"{i:03d}_{sanitize_filename(content['title'])}"
             filename = f"{base_name}{ext}"
-            filepath = os.path.join(output_dir, filename)
+            # 不含扩展名的路径只拼一次: 文件路径与 save_content 的参数都由它得到
+            base_path = os.path.join(output_dir, base_name)
+            filepath = base_path + ext
             
             # 使用 Token 作为 Key
-            key = get_url_key(content['url'])
+            # (不再额外写入完整 URL: Token 不含 "/"，完整 URL 作为 Key 永远不会被查到)
+            key = _get_url_key(content['url'])
             if key:
                 token_map[key] = filename
+            page_keys.append(key)
             
-            # 同时也保留完整 URL 映射 (兜底)
-            token_map[content['url']] = filename
-            
-            save_content(content, filepath[:-len(ext)], output_format)
+            # Markdown 需要等映射表建完、做完链接替换后再写入
+            if output_format != 'markdown':
+                write_jobs.append((save_content, (content, base_path, output_format)))
             file_list.append((filepath, content))
             
-        # 2. 离线链接替换
+        # 2. 离线链接替换 (在内存中替换，每个文件只写一次)
         if output_format == 'markdown':
             print("[INFO] 正在执行本地链接替换 (Local Link Rewriting)...")
             replaced_count = 0
-            
             for filepath, content in file_list:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    file_text = f.read()
-                
-                def replace_link(match):
-                    nonlocal replaced_count
-                    text = match.group(1)
-                    link = match.group(2)
-                    
-                    # 尝试匹配
-                    target = None
-                    
-                    # 策略A: Token 匹配
-                    link_key = get_url_key(link)
-                    if link_key and link_key in token_map:
-                        target = token_map[link_key]
-                    
-                    if target:
-                        replaced_count += 1
-                        return f"[{text}](./{target})"
-                    else:
-                        return match.group(0)
-                
-                # 执行替换
-                new_text = re.sub(r'\[([^\]]+)\]\((http[^)]+)\)', replace_link, file_text)
-                
-                if new_text != file_text:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(new_text)
+                new_text, count = _rewrite_links(format_markdown(content), token_map)
+                replaced_count += count
+                write_jobs.append((write_text_file, (filepath, new_text)))
 
             print(f"[INFO] 链接替换完成，共修复 {replaced_count} 个处链接")
 
+        # 文件之间互不依赖: 用线程池并发写盘 (写文件时释放 GIL，磁盘 I/O 可以重叠)
+        # 替换计数等共享状态只在上面的主线程阶段修改，线程中只做纯写入
+        with ThreadPoolExecutor(max_workers=min(_SAVE_WORKERS, max(len(write_jobs), 1))) as pool:
+            # 消费 map 的结果，写入异常会在这里抛出
+            for _ in pool.map(lambda job: job[0](*job[1]), write_jobs):
+                pass
+
         # 3. 保存索引
         index_path = f"{output_dir}/index.md"
-        with open(index_path, 'w', encoding='utf-8') as f:
-            f.write("# 抓取结果索引\n\n")
-            f.write(f"**抓取时间:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"**总页面:** {len(ordered_results)}\n\n")
-            for i, content in enumerate(ordered_results, 1):
-                clean_url = content['url'].split('#')[0].split('?')[0]
-                key = get_url_key(clean_url)
-                filename = token_map.get(key, "unknown.md")
-                f.write(f"{i}. [{content['title']}](./{filename})\n   > Origin: {clean_url}\n\n")
+        # 先在内存中拼好整个索引，再一次性写入
+        index_parts = [
+            "# 抓取结果索引\n\n",
+            f"**抓取时间:** {datetime.now().isoformat(sep=' ', timespec='seconds')}\n",
+            f"**总页面:** {len(ordered_results)}\n\n",
+        ]
+        # 每个页面的 Token 已在第 1 步算好 (去掉 query/hash 不影响 Token)，这里直接复用
+        for i, (content, key) in enumerate(zip(ordered_results, page_keys), 1):
+            clean_url = content['url'].partition('#')[0].partition('?')[0]
+            filename = token_map.get(key, "unknown.md")
+            index_parts.append(f"{i}. [{content['title']}](./{filename})\n   > Origin: {clean_url}\n\n")
+        write_text_file(index_path, ''.join(index_parts))
         
         print(f"[SUCCESS] 保存完成! 共 {len(ordered_results)} 个文件")
+
+
+# --- 保存 ---
+@lru_cache(maxsize=65536)
+def _get_url_key(u: str) -> str:
+    """
+    获取 URL 的唯一 Token (最后一段)，用于本地链接替换
+
+    同一链接 (导航栏、目录) 会出现在大量文件中，结果做缓存，重复链接直接命中
+    """
+    if not u: return ""
+    # 移除 query 和 hash (partition 只切第一处，不生成多余的片段列表)
+    u = u.partition('#')[0].partition('?')[0]
+    # 移除结尾斜杠
+    if u.endswith('/'): u = u[:-1]
+    # 获取最后一段
+    return u.rpartition('/')[2]
+
+
+def _rewrite_links(text: str, token_map: Dict[str, str]):
+    """
+    将 Markdown 中指向已抓取页面的外链替换为本地文件链接
+
+    Returns:
+        (替换后的文本, 替换次数)
+    """
+    # 先用子串查找快速跳过不含外链的页面，无需进入正则扫描
+    if '](http' not in text:
+        return text, 0
+    
+    # 逐个匹配并只在首次命中后才开始拼接，无可替换目标时直接返回原字符串，不产生新副本
+    parts = []
+    last = 0
+    for match in _MD_LINK_RE.finditer(text):
+        # 策略A: Token 匹配
+        link_key = _get_url_key(match.group(2))
+        target = token_map.get(link_key) if link_key else None
+        if target:
+            parts.append(text[last:match.start()])
+            parts.append(f"[{match.group(1)}](./{target})")
+            last = match.end()
+    
+    if not parts:
+        return text, 0
+    parts.append(text[last:])
+    return ''.join(parts), len(parts) // 2
+
+
+# --- 解析进程池 ---
+# 子进程内的 WebReader 实例 (由进程池 initializer 创建，只用于解析)
+_worker_reader: Optional[WebReader] = None
+
+
+def _init_extract_worker(config: dict):
+    """
+    进程池初始化: 每个子进程只构造一次 WebReader
+    """
+    global _worker_reader
+    _worker_reader = WebReader(config)
+
+
+def _extract_in_worker(html: str, url: str) -> Dict[str, Any]:
+    """
+    在子进程中执行 _extract_text (模块级函数，可被 pickle)
+    """
+    return _worker_reader._extract_text(html, url)
@@ -0,0 +1,179 @@
+"""
+crawler 提取逻辑的回归测试
+
+运行: python -m unittest test_crawler
+"""
+
+import os
+import re
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cache import PageCache
+from crawler import WebReader
+from config import DEFAULT_CONFIG
+from utils import ExcludePatternList, compile_exclude_patterns, should_exclude_url
+
+
+class InlineScriptTest(unittest.TestCase):
+    """移除 <script>/<style> 后，两侧的文本节点仍应各自独立"""
+
+    URL = 'https://ai.feishu.cn/wiki/page'
+
+    def extract(self, html: str, output_format: str = 'markdown'):
+        reader = WebReader({'output_format': output_format})
+        return reader._extract_text(html, self.URL)
+
+    def test_text_around_inline_script_is_not_joined(self):
+        html = ('<html><body><div>Alpha<script>var s = "</div>";</script>Beta'
+                '<style>p { color: red; }</style>Gamma</div></body></html>')
+        for output_format in ('markdown', 'json', 'txt'):
+            text = self.extract(html, output_format)['text']
+            self.assertIn('Alpha', text)
+            self.assertIn('Beta', text)
+            self.assertIn('Gamma', text)
+            self.assertNotIn('AlphaBeta', text)
+            self.assertNotIn('BetaGamma', text)
+            self.assertNotIn('var s', text)
+            self.assertNotIn('color: red', text)
+
+    def test_text_link_lookup_survives_inline_script(self):
+        # 正文中的 "Guide" 靠目录树的文本映射补全链接，脚本不能把它和相邻文本拼在一起
+        html = ('<html><body><div class="sidebar"><a href="/wiki/guide">Guide</a></div>'
+                '<div class="doc-content"><p>Intro</p>Guide<script>track()</script>Next</div>'
+                '</body></html>')
+        content = self.extract(html)
+        self.assertIn('https://ai.feishu.cn/wiki/guide', content['links'])
+        self.assertNotIn('GuideNext', content['text'])
+
+    def test_script_marker_in_attribute_keeps_content(self):
+        html = ('<html><body><div class="doc-content"><img alt="<script>">'
+                '<p>kept paragraph</p><script>x()</script><p>tail</p></div></body></html>')
+        text = self.extract(html)['text']
+        self.assertIn('kept paragraph', text)
+        self.assertIn('tail', text)
+        self.assertNotIn('x()', text)
+
+
+class PageCacheTest(unittest.TestCase):
+    """缓存按提取相关配置分别命中，过期条目不再返回"""
+
+    KEY = 'feishu.cn/wiki/page'
+    CONTENT = {'url': 'https://ai.feishu.cn/wiki/page', 'title': 'Page', 'text': 'body'}
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open_cache(self, config=None, ttl: float = 0) -> PageCache:
+        cache = PageCache(self.path, ttl, WebReader(config)._cache_variant())
+        self.addCleanup(cache.conn.close)
+        return cache
+
+    def store(self, config=None):
+        # 写入后关闭: 批量提交的写入在 close() 时落盘，之后新打开的连接才能读到
+        cache = PageCache(self.path, 0, WebReader(config)._cache_variant())
+        cache.put(self.KEY, 0, self.CONTENT)
+        cache.close()
+
+    def test_hit_with_same_settings(self):
+        self.store({'output_format': 'json'})
+        self.assertEqual(self.open_cache({'output_format': 'json'}).get(self.KEY), self.CONTENT)
+
+    def test_hit_after_output_format_change(self):
+        # 提取结果与输出格式无关，切换格式不应使缓存失效
+        self.store({'output_format': 'markdown'})
+        self.assertEqual(self.open_cache({'output_format': 'txt'}).get(self.KEY), self.CONTENT)
+
+    def test_miss_after_extract_settings_change(self):
+        self.store()
+        settings = {**DEFAULT_CONFIG['extract_settings'], 'min_text_length': 100}
+        self.assertIsNone(self.open_cache({'extract_settings': settings}).get(self.KEY))
+
+    def test_miss_after_render_settings_change(self):
+        self.store()
+        self.assertIsNone(self.open_cache({'javascript_enabled': False}).get(self.KEY))
+
+    def test_expires_after_ttl(self):
+        cache = self.open_cache(ttl=60)
+        cache.put(self.KEY, 0, self.CONTENT)
+        self.assertEqual(cache.get(self.KEY), self.CONTENT)
+        with mock.patch('cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get(self.KEY))
+
+
+class ExcludePatternTest(unittest.TestCase):
+    """合并后的单个正则与逐个匹配的回退路径，结果都应与逐个 re.search 一致"""
+
+    URLS = [
+        'https://example.com/logo.PNG',
+        'https://example.com/docs/guide',
+        'https://example.com/aa/page',
+        'https://example.com/ab/page',
+        'https://example.com/login?next=/',
+        'https://example.com/static/app.js',
+        'https://example.com/wiki/node-1',
+    ]
+
+    def assert_matches_baseline(self, patterns):
+        compiled = compile_exclude_patterns(patterns)
+        for url in self.URLS:
+            expected = any(re.search(p, url, re.IGNORECASE) for p in patterns)
+            self.assertEqual(should_exclude_url(url, compiled), expected, url)
+            self.assertEqual(should_exclude_url(url, patterns), expected, url)
+
+    def test_plain_patterns_are_merged(self):
+        patterns = [r'.*\.(png|jpg)$', r'/login\b', r'\.js$']
+        self.assertIsInstance(compile_exclude_patterns(patterns), re.Pattern)
+        self.assert_matches_baseline(patterns)
+
+    def test_backreference_falls_back_to_per_pattern(self):
+        patterns = [r'/(a)\1/', r'/login\b']
+        self.assertIsInstance(compile_exclude_patterns(patterns), ExcludePatternList)
+        self.assert_matches_baseline(patterns)
+
+    def test_leading_global_flag_falls_back_to_per_pattern(self):
+        patterns = [r'(?x) /wiki/ node - \d+', r'\.js$']
+        self.assertIsInstance(compile_exclude_patterns(patterns), ExcludePatternList)
+        self.assert_matches_baseline(patterns)
+
+    def test_default_patterns_match_baseline(self):
+        patterns = DEFAULT_CONFIG['exclude_patterns']
+        self.assertIsInstance(compile_exclude_patterns(patterns), re.Pattern)
+        self.assert_matches_baseline(patterns)
+
+    def test_named_group_falls_back_to_per_pattern(self):
+        patterns = [r'/(?P<seg>wiki)/', r'/(?P<seg>docs)/']
+        self.assertIsInstance(compile_exclude_patterns(patterns), ExcludePatternList)
+        self.assert_matches_baseline(patterns)
+
+
+class ContentDedupTest(unittest.TestCase):
+    """开启 dedup_content 时只丢弃标题与正文都相同的页面"""
+
+    def content(self, url: str, title: str = 'Page', text: str = 'same body'):
+        return {'url': url, 'title': title, 'text': text}
+
+    def test_disabled_by_default(self):
+        reader = WebReader()
+        self.assertTrue(reader._is_new_content(self.content('https://a.cn/1')))
+        self.assertTrue(reader._is_new_content(self.content('https://a.cn/2')))
+
+    def test_drops_exact_duplicate(self):
+        reader = WebReader({'dedup_content': True})
+        self.assertTrue(reader._is_new_content(self.content('https://a.cn/1')))
+        self.assertFalse(reader._is_new_content(self.content('https://a.cn/2')))
+
+    def test_keeps_page_when_only_title_differs(self):
+        reader = WebReader({'dedup_content': True})
+        self.assertTrue(reader._is_new_content(self.content('https://a.cn/1', title='One')))
+        self.assertTrue(reader._is_new_content(self.content('https://a.cn/2', title='Two')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,23 @@
 import re
 import os
 import json
-from urllib.parse import urlparse, urljoin
+from functools import lru_cache
+from urllib.parse import urlsplit, urljoin
 from datetime import datetime
-from typing import Optional, List, Set
+from typing import Optional, List, Set, Union, Pattern
 
+try:
+    import orjson  # 可选依赖: 更快的 JSON 序列化，直接输出 UTF-8 字节
+except ImportError:
+    orjson = None
 
+
+# 链接图中大量 URL 在不同页面间重复出现 (导航栏、侧边栏)，
+# 对纯函数的 URL 工具做缓存，避免重复解析同一字符串
+_URL_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=_URL_CACHE_SIZE)
 def normalize_url(url: str, base_url: str = None) -> Optional[str]:
     """
     标准化URL，处理相对路径和绝对路径
@@ -38,6 +50,7 @@ def normalize_url(url: str, base_url: str = None) -> Optional[str]:
     return url if url.startswith(('http://', 'https://')) else None
 
 
+@lru_cache(maxsize=_URL_CACHE_SIZE)
 def get_domain(url: str, extract_root: bool = False) -> str:
     """
     从URL中提取域名
@@ -49,8 +62,8 @@ def get_domain(url: str, extract_root: bool = False) -> str:
     Returns:
         域名字符串
     """
-    parsed = urlparse(url)
-    netloc = parsed.netloc
+    # urlsplit 不解析 params 段，比 urlparse 更轻量，netloc 结果相同
+    netloc = urlsplit(url).netloc
     
     if extract_root and netloc:
         # 提取根域名 (如 ai.feishu.cn -> feishu.cn)
@@ -67,6 +80,7 @@ def get_domain(url: str, extract_root: bool = False) -> str:
     return netloc
 
 
+@lru_cache(maxsize=_URL_CACHE_SIZE)
 def is_same_domain(url1: str, url2: str) -> bool:
     """
     检查两个URL是否属于同一域名（基于根域名匹配）
@@ -84,24 +98,87 @@ def is_same_domain(url1: str, url2: str) -> bool:
     return get_domain(url1, extract_root=True) == get_domain(url2, extract_root=True)
 
 
-def should_exclude_url(url: str, patterns: List[str]) -> bool:
+def compile_exclude_patterns(patterns: List[str]) -> Optional[Union[Pattern, 'ExcludePatternList']]:
+    """
+    将排除模式列表合并编译为单个正则 (一次扫描匹配所有模式)
+    
+    含反向引用、命名分组或内联全局标志 (如 (?i)、(?x)) 的模式合并后语义会改变或无法编译，
+    此时退回为逐个编译的模式列表，逐个匹配
+    
+    Args:
+        patterns: 排除模式列表 (正则表达式)
+    
+    Returns:
+        编译后的正则对象 (或 ExcludePatternList)，模式列表为空则返回None
+    """
+    return _compile_exclude_patterns(tuple(patterns or ()))
+
+
+class ExcludePatternList(tuple):
+    """逐个编译的排除模式: 与 re.Pattern 一样提供 search，任一模式命中即返回其匹配结果"""
+    
+    def search(self, string: str):
+        for pattern in self:
+            match = pattern.search(string)
+            if match is not None:
+                return match
+        return None
+
+
+# 不带内联标志时单个模式编译后的标志位，用于识别 (?x) 之类会作用于整个正则的全局标志
+_DEFAULT_EXCLUDE_FLAGS = re.compile('', re.IGNORECASE).flags
+
+# 按编号引用分组的写法: \1、(?P=name)、(?(1)...) (宁可误判为引用，误判只会退回逐个匹配)
+_GROUP_REFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+@lru_cache(maxsize=64)
+def _compile_exclude_patterns(patterns: tuple) -> Optional[Union[Pattern, ExcludePatternList]]:
+    if not patterns:
+        return None
+    compiled = [re.compile(p, re.IGNORECASE) for p in patterns]
+    # 普通分组合并后无影响 (每个模式都包在 (?:...) 中)；反向引用/条件分组的编号会错位、同名分组会冲突，
+    # 全局标志会影响其他模式或在合并后编译失败，这些情况才逐个匹配
+    if all(not c.groupindex and not _GROUP_REFERENCE_RE.search(p) and c.flags == _DEFAULT_EXCLUDE_FLAGS
+           for p, c in zip(patterns, compiled)):
+        try:
+            return re.compile('|'.join(f'(?:{p})' for p in patterns), re.IGNORECASE)
+        except re.error:
+            pass
+    return ExcludePatternList(compiled)
+
+
+def should_exclude_url(url: str, patterns: Union[List[str], Pattern, ExcludePatternList, None]) -> bool:
     """
     检查URL是否应该被排除
     
     Args:
         url: 待检查的URL
-        patterns: 排除模式列表 (正则表达式)
+        patterns: 排除模式列表 (正则表达式)，或 compile_exclude_patterns 的编译结果
     
     Returns:
         是否应该排除
     """
-    url_lower = url.lower()
-    for pattern in patterns:
-        if re.search(pattern, url_lower, re.IGNORECASE):
-            return True
-    return False
+    if patterns is None:
+        return False
+    if not isinstance(patterns, (re.Pattern, ExcludePatternList)):
+        patterns = compile_exclude_patterns(patterns)
+        if patterns is None:
+            return False
+    return _is_excluded(url, patterns)
+
+
+@lru_cache(maxsize=_URL_CACHE_SIZE)
+def _is_excluded(url: str, pattern: Union[Pattern, ExcludePatternList]) -> bool:
+    return pattern.search(url) is not None
+
+
+# 文件名中的非法字符 / 连续空白 (同名标题如 "Overview" 很常见，sanitize_filename 结果做缓存)
+_ILLEGAL_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+_WS_RE = re.compile(r'\s+')
 
 
+@lru_cache(maxsize=4096)
 def sanitize_filename(text: str, max_length: int = 100) -> str:
     """
     将文本转换为安全的文件名
@@ -114,9 +191,9 @@ def sanitize_filename(text: str, max_length: int = 100) -> str:
         安全的文件名
     """
     # 移除非法字符
-    filename = re.sub(r'[<>:"/\\|?*]', '', text)
+    filename = _ILLEGAL_FILENAME_CHARS_RE.sub('', text)
     # 替换空白为下划线
-    filename = re.sub(r'\s+', '_', filename)
+    filename = _WS_RE.sub('_', filename)
     # 限制长度
     filename = filename[:max_length]
     # 移除首尾的点和空格
@@ -141,6 +218,23 @@ def create_output_dir(base_dir: str) -> str:
     return output_dir
 
 
+def format_markdown(content: dict) -> str:
+    """
+    生成 Markdown 文件内容 (标题 + 正文)
+    
+    Args:
+        content: 内容字典 (包含 title, text 等)
+    
+    Returns:
+        Markdown 文本
+    """
+    return f"# {content.get('title', 'Untitled')}\n\n{content.get('text', '')}"
+
+
+# txt 输出中头部与正文之间的分隔线
+_TXT_RULE = "=" * 50
+
+
 def save_content(content: dict, filepath: str, format: str = 'markdown'):
     """
     保存内容到文件
@@ -152,20 +246,37 @@ def save_content(content: dict, filepath: str, format: str = 'markdown'):
     """
     if format == 'markdown':
         ext = '.md'
-        text = f"# {content.get('title', 'Untitled')}\n\n"
-        text += content.get('text', '')
+        text = format_markdown(content)
     elif format == 'json':
         ext = '.json'
-        text = json.dumps(content, ensure_ascii=False, indent=2)
+        # orjson 序列化更快，未安装时回退到标准库；两者都经 write_text_file 写入，换行符保持一致
+        if orjson is not None:
+            text = orjson.dumps(content, option=orjson.OPT_INDENT_2).decode('utf-8')
+        else:
+            text = json.dumps(content, ensure_ascii=False, indent=2)
     else:
         ext = '.txt'
-        text = f"标题: {content.get('title', 'Untitled')}\n"
-        text += f"URL: {content.get('url', '')}\n"
-        text += f"抓取时间: {content.get('crawl_time', '')}\n"
-        text += "=" * 50 + "\n\n"
-        text += content.get('text', '')
+        # 单个 f-string 模板一次生成，避免正文被多次 += 复制
+        text = (
+            f"标题: {content.get('title', 'Untitled')}\n"
+            f"URL: {content.get('url', '')}\n"
+            f"抓取时间: {content.get('crawl_time', '')}\n"
+            f"{_TXT_RULE}\n\n"
+            f"{content.get('text', '')}"
+        )
     
-    with open(filepath + ext, 'w', encoding='utf-8') as f:
+    write_text_file(filepath + ext, text)
+
+
+def write_text_file(filepath: str, text: str):
+    """
+    写入 UTF-8 文本文件 (文本模式，Windows 上换行为 CRLF)
+    
+    Args:
+        filepath: 文件路径
+        text: 文件内容
+    """
+    with open(filepath, 'w', encoding='utf-8') as f:
         f.write(text)
 
 